@@ -0,0 +1,74 @@
+'''
+
+bench_fetch
+~~~~~~~~~~~~~
+
+Time the KEGG download of multi_utils.request_api() end to end against
+the local stand-in server (kegg_stand_in), for several settings of
+concurrency, batching and source. No network access is needed.
+
+Usage:
+	python bench_fetch.py --bact 500 --ec 700 --latency 0.05 --threads 1 8 --batch 1 10
+
+python 2.7.5
+
+'''
+import argparse
+import shutil
+import tempfile
+import time
+
+import kegg_stand_in as ks
+import multi_utils as mu
+
+
+def bench(catalog, n_threads, batch_size, source, latency=0., error_rate=0.):
+	'''
+	Run request_api() once against a fresh stand-in server.
+
+	Returns
+	-------
+	result : dictionary
+		'seconds', 'requests', 'bytes' and 'ec_per_second'
+	'''
+	server = ks.StandInServer(catalog, latency=latency, error_rate=error_rate).start()
+	database_direct = mu.database_direct
+	mu.database_direct = tempfile.mkdtemp() + '/'
+	try:
+		t0 = time.time()
+		mu.request_api(n_threads=n_threads, rate_limit=None, base_url=server.url, batch_size=batch_size, source=source)
+		seconds = time.time() - t0
+	finally:
+		shutil.rmtree(mu.database_direct)
+		mu.database_direct = database_direct
+		server.stop()
+	n_ec = catalog['list/enzyme'].count('\n')
+	return {'seconds': seconds, 'requests': server.n_requests, 'bytes': server.n_bytes, 'ec_per_second': n_ec / seconds}
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Benchmark request_api() against a local KEGG stand-in.')
+	parser.add_argument('--bact', type=int, default=500, help='number of synthetic bacteria')
+	parser.add_argument('--ec', type=int, default=700, help='number of synthetic enzymes')
+	parser.add_argument('--latency', type=float, default=0.05, help='seconds per request')
+	parser.add_argument('--error-rate', type=float, default=0.)
+	parser.add_argument('--threads', type=int, nargs='+', default=[1, 8])
+	parser.add_argument('--batch', type=int, nargs='+', default=[1, 10])
+	parser.add_argument('--link', action='store_true', help='also time the link endpoints')
+	args = parser.parse_args()
+
+	catalog = ks.synthetic_catalog(n_bact=args.bact, n_ec=args.ec)
+	settings = [(n, b, 'genes') for n in args.threads for b in args.batch]
+	if args.link:
+		settings = settings + [(n, 1, 'link') for n in args.threads]
+
+	results = []
+	for n_threads, batch_size, source in settings:
+		result = bench(catalog, n_threads, batch_size, source, latency=args.latency, error_rate=args.error_rate)
+		results.append((n_threads, batch_size, source, result))
+
+	print('')
+	print('%8s %6s %6s %10s %10s %12s %10s' % ('threads', 'batch', 'source', 'seconds', 'requests', 'bytes', 'EC/s'))
+	for n_threads, batch_size, source, result in results:
+		print('%8d %6d %6s %10.2f %10d %12d %10.1f' % (n_threads, batch_size, source,
+			result['seconds'], result['requests'], result['bytes'], result['ec_per_second']))
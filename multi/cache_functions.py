@@ -0,0 +1,106 @@
+'''
+
+cache_functions
+~~~~~~~~~~~~~
+
+Contains an on-disk cache for raw KEGG REST responses.
+
+Response bodies are stored gzip-compressed under the SHA-1 of their
+content (objects/), so identical responses are kept once. A small
+reference file per request path (refs/) points to the content and
+records when it was downloaded. Each endpoint ('list', 'get', 'link')
+has its own time-to-live. In offline mode every request is served
+from the cache regardless of age, and a missing entry is an error.
+
+python 2.7.5
+
+'''
+import gzip
+import hashlib
+import os
+import threading
+import time
+
+
+ttl_default = {'list': 24*3600, 'get': 7*24*3600, 'link': 7*24*3600}
+# seconds a cached response stays valid, per endpoint
+
+
+def _sha1(text):
+	return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _tmp(filename):
+	# unique per process and thread, so concurrent writers never collide
+	return '{}.{}.{}.tmp'.format(filename, os.getpid(), threading.current_thread().ident)
+
+
+class ResponseCache(object):
+	'''
+	On-disk cache of KEGG REST responses.
+
+	Parameters
+	----------
+	cache_dir : string
+		Directory of the cache. End this string with '/'
+	ttl : dict or None
+		key - endpoint, e.g. 'get' (string)
+		value - time-to-live in seconds (number). None means never expire.
+		Endpoints missing from the dict never expire.
+	offline : bool
+		Serve everything from the cache and never go to the network.
+	'''
+	def __init__(self, cache_dir, ttl=None, offline=False):
+		self.cache_dir = cache_dir
+		self.ttl = ttl_default if ttl is None else ttl
+		self.offline = offline
+		for sub in ('objects', 'refs'):
+			if not os.path.isdir(cache_dir + sub):
+				os.makedirs(cache_dir + sub)
+
+	def _ref_file(self, path):
+		return self.cache_dir + 'refs/' + _sha1(path)
+
+	def _object_file(self, digest):
+		return self.cache_dir + 'objects/' + digest[:2] + '/' + digest + '.gz'
+
+	def get(self, path):
+		'''
+		Return the cached body of `path`, or None if it is missing or expired.
+		In offline mode a missing entry raises IOError.
+		'''
+		ref_file = self._ref_file(path)
+		if not os.path.exists(ref_file):
+			if self.offline:
+				raise IOError('Not in the KEGG cache (offline mode): ' + path)
+			return None
+		with open(ref_file, 'r') as fp:
+			digest, stamp = fp.read().split('\t')[:2]
+		ttl = self.ttl.get(path.split('/')[0])
+		if not self.offline and ttl is not None and time.time() - float(stamp) > ttl:
+			return None
+		with gzip.open(self._object_file(digest), 'rb') as fp:
+			return fp.read().decode('utf-8')
+
+	def put(self, path, text):
+		'''
+		Store the body of `path`.
+		'''
+		digest = _sha1(text)
+		object_file = self._object_file(digest)
+		if not os.path.exists(object_file):
+			try:
+				os.makedirs(os.path.dirname(object_file))
+			except OSError:
+				pass
+				# already created, possibly by another thread
+			tmp_file = _tmp(object_file)
+			with gzip.open(tmp_file, 'wb') as fp:
+				fp.write(text.encode('utf-8'))
+			os.rename(tmp_file, object_file)
+		ref_file = self._ref_file(path)
+		tmp_file = _tmp(ref_file)
+		with open(tmp_file, 'w') as fp:
+			fp.write('{}\t{}\t{}'.format(digest, time.time(), path))
+		os.rename(tmp_file, ref_file)
+		return None
@@ -0,0 +1,77 @@
+'''
+
+compound_functions
+~~~~~~~~~~~~~
+
+Contains the global compound interning table of the multi pipeline.
+
+Compounds are KEGG numbers (e.g. C00890 -> 890, glycans 100000 + n, see
+reaction_db_functions.compound_id). The table maps every compound that
+appears in any reactant pair to a dense int32 ID, 0 .. n-1, in
+increasing order of the KEGG number. Edges are kept either as two int32
+arrays (src, dest) or as one packed int64 key per edge, src in the high
+32 bits and dest in the low 32 bits; packed keys of the same table sort
+and compare like (src, dest) tuples.
+
+python 2.7.5
+
+'''
+import numpy as np
+
+
+class CompoundTable(object):
+	'''
+	KEGG compound number <-> dense int32 ID.
+
+	Parameters
+	----------
+	compounds : numpy array of int32
+		Distinct KEGG compound numbers, sorted. Position = dense ID.
+	'''
+	def __init__(self, compounds):
+		self.compounds = np.asarray(compounds, dtype=np.int32)
+
+	@classmethod
+	def from_arrays(cls, lst_arr):
+		'''
+		Table of all compounds in a list of int arrays (e.g. edge arrays).
+		'''
+		lst_arr = [np.asarray(arr, dtype=np.int32).ravel() for arr in lst_arr]
+		if not lst_arr:
+			return cls(np.zeros(0, dtype=np.int32))
+		return cls(np.unique(np.concatenate(lst_arr)))
+
+	def __len__(self):
+		return len(self.compounds)
+
+	def intern(self, arr):
+		'''
+		Dense IDs (int32, same shape) of KEGG compound numbers, which
+		must all be in the table.
+		'''
+		arr = np.asarray(arr, dtype=np.int32)
+		ids = np.searchsorted(self.compounds, arr).astype(np.int32)
+		if arr.size and (ids.max() >= len(self.compounds) or (self.compounds[ids] != arr).any()):
+			raise KeyError('Compound not in the table')
+		return ids
+
+	def extern(self, ids):
+		'''
+		KEGG compound numbers (int32, same shape) of dense IDs.
+		'''
+		return self.compounds[np.asarray(ids)]
+
+
+def pack(src, dest):
+	'''
+	Packed int64 keys of edges given as two int32 arrays.
+	'''
+	return (np.asarray(src, dtype=np.int64) << 32) | np.asarray(dest, dtype=np.int64)
+
+
+def unpack(keys):
+	'''
+	[src, dest] int32 arrays of packed int64 keys.
+	'''
+	keys = np.asarray(keys, dtype=np.int64)
+	return [(keys >> 32).astype(np.int32), (keys & 0xffffffff).astype(np.int32)]
@@ -0,0 +1,139 @@
+'''
+
+dict_cache_functions
+~~~~~~~~~~~~~
+
+Contains a build cache for the output of multi_utils.obtain_dict.
+
+The key is the SHA-1 of the contents of the input files (EC - bacteria
+relations, EC - reaction relations, bioreaction database) together with
+code_version and the options of the build. One .npz file per key holds
+lst_bact, dict_bact_ec and dict_ec_pairs as flat arrays:
+	bact, ec                       names
+	bact_indptr, bact_ec           bacterium -> EC numbers, in list order
+	pair_ec, pair_indptr, pairs    EC -> reactant pairs, int32 (n, 2)
+
+Every refresh of the database gives new keys; prune keeps only the
+most recently used entries.
+
+python 2.7.5
+
+'''
+import hashlib
+import os
+
+import numpy as np
+
+
+code_version = '1'
+# change this whenever obtain_dict or the pair extraction gives a different result
+
+cache_keep = 3
+# number of cache entries kept by prune
+
+
+def file_hash(filename, chunk_size=1 << 20):
+	'''
+	SHA-1 (hex) of the contents of a file.
+	'''
+	h = hashlib.sha1()
+	with open(filename, 'rb') as fp:
+		while True:
+			chunk = fp.read(chunk_size)
+			if not chunk:
+				break
+			h.update(chunk)
+	return h.hexdigest()
+
+
+def cache_key(lst_filename, options=''):
+	'''
+	Key of a build from its input files, in a fixed order, and a string
+	of the options that change the result.
+	'''
+	h = hashlib.sha1('obtain_dict ' + code_version + ' ' + options)
+	for filename in lst_filename:
+		h.update(' ' + file_hash(filename))
+	return h.hexdigest()
+
+
+def save(filename, lst_bact, dict_bact_ec, dict_ec_pairs):
+	'''
+	Write the output of obtain_dict to filename (.npz).
+	'''
+	lst_ec = []
+	ec_index = {}
+	bact_indptr = [0]
+	bact_ec = []
+	for bact in lst_bact:
+		for ec in dict_bact_ec[bact]:
+			if ec not in ec_index:
+				ec_index[ec] = len(lst_ec)
+				lst_ec.append(ec)
+			bact_ec.append(ec_index[ec])
+		bact_indptr.append(len(bact_ec))
+
+	lst_pair_ec = sorted(dict_ec_pairs)
+	pair_indptr = [0]
+	pairs = []
+	for ec in lst_pair_ec:
+		pairs.extend(dict_ec_pairs[ec])
+		pair_indptr.append(len(pairs))
+
+	tmp = filename + '.tmp.npz'
+	np.savez(tmp,
+		bact=np.array(lst_bact, dtype=str),
+		ec=np.array(lst_ec, dtype=str),
+		bact_indptr=np.array(bact_indptr, dtype=np.int64),
+		bact_ec=np.array(bact_ec, dtype=np.int32),
+		pair_ec=np.array(lst_pair_ec, dtype=str),
+		pair_indptr=np.array(pair_indptr, dtype=np.int64),
+		pairs=np.array(pairs, dtype=np.int32).reshape(-1, 2))
+	os.rename(tmp, filename)
+	# a build that is interrupted never leaves a partial cache entry
+	return None
+
+
+def load(filename):
+	'''
+	Read a file written by save, and mark it as used (modification
+	time) for prune.
+
+	Returns
+	-------
+	[lst_bact, dict_bact_ec, dict_ec_pairs]
+	'''
+	os.utime(filename, None)
+	data = np.load(filename)
+	lst_bact = data['bact'].tolist()
+	lst_ec = data['ec'].tolist()
+	bact_indptr = data['bact_indptr'].tolist()
+	bact_ec = data['bact_ec'].tolist()
+	dict_bact_ec = {}
+	for j in range(0, len(lst_bact)):
+		dict_bact_ec[lst_bact[j]] = [lst_ec[i] for i in bact_ec[bact_indptr[j]:bact_indptr[j+1]]]
+
+	lst_pair_ec = data['pair_ec'].tolist()
+	pair_indptr = data['pair_indptr'].tolist()
+	pairs = [tuple(x) for x in data['pairs'].tolist()]
+	dict_ec_pairs = {}
+	for i in range(0, len(lst_pair_ec)):
+		dict_ec_pairs[lst_pair_ec[i]] = pairs[pair_indptr[i]:pair_indptr[i+1]]
+
+	return [lst_bact, dict_bact_ec, dict_ec_pairs]
+
+
+def prune(dirname, prefix='KEGG_dict_', keep=cache_keep):
+	'''
+	Delete all but the `keep` most recently used cache entries
+	(prefix<key>.npz) in dirname.
+
+	Returns
+	-------
+	n_removed : int
+	'''
+	lst_fn = [fn for fn in os.listdir(dirname) if fn.startswith(prefix) and fn.endswith('.npz') and not fn.endswith('.tmp.npz')]
+	lst_fn.sort(key=lambda fn: os.path.getmtime(os.path.join(dirname, fn)), reverse=True)
+	for fn in lst_fn[keep:]:
+		os.remove(os.path.join(dirname, fn))
+	return len(lst_fn[keep:])
@@ -0,0 +1,137 @@
+'''
+
+ec_matrix_functions
+~~~~~~~~~~~~~
+
+Contains a compact representation of the EC - bacteria relations.
+
+The relation is kept as a sparse boolean matrix in CSR form: for EC
+number i, the bacteria that encode it are
+bact[indices[indptr[i]:indptr[i+1]]]. The EC numbers and bacteria names
+are kept in two sidecar arrays. The transposed matrix (bacterium -> ECs)
+is built once on first use. Saved as one .npz file.
+
+python 2.7.5
+
+'''
+import numpy as np
+
+
+class ECBactMatrix(object):
+	'''
+	Sparse EC x bacteria matrix.
+
+	Parameters
+	----------
+	lst_ec : list of strings
+		EC numbers, one per row
+	lst_bact : list of strings
+		Bacteria names (abbrieviations), one per column
+	indptr : numpy array of int64, length len(lst_ec) + 1
+	indices : numpy array of int32
+		Column (bacterium) indices of each row, sorted
+	'''
+	def __init__(self, lst_ec, lst_bact, indptr, indices):
+		self.ec = np.asarray(lst_ec, dtype=str)
+		self.bact = np.asarray(lst_bact, dtype=str)
+		self.indptr = np.asarray(indptr, dtype=np.int64)
+		self.indices = np.asarray(indices, dtype=np.int32)
+		self._row_of = None
+		self._col_of = None
+		self._t_indptr = None
+		self._t_indices = None
+
+	@classmethod
+	def from_sets(cls, lst_ec, lst_bact, rows):
+		'''
+		Build the matrix from the bacteria of each EC.
+
+		Parameters
+		----------
+		lst_ec : list of strings
+			EC numbers
+		lst_bact : list of strings
+			Bacteria names, in column order
+		rows : iterable of lists of strings
+			Bacteria that encode each EC, in the order of lst_ec
+		'''
+		col_of = dict((b, j) for j, b in enumerate(lst_bact))
+		indptr = [0]
+		indices = []
+		for bacts in rows:
+			indices.extend(sorted(col_of[b] for b in bacts))
+			indptr.append(len(indices))
+		return cls(lst_ec, lst_bact, indptr, indices)
+
+	@classmethod
+	def load(cls, filename):
+		data = np.load(filename)
+		return cls(data['ec'], data['bact'], data['indptr'], data['indices'])
+
+	def save(self, filename):
+		np.savez_compressed(filename, ec=self.ec, bact=self.bact, indptr=self.indptr, indices=self.indices)
+		return None
+
+	@property
+	def shape(self):
+		return (len(self.ec), len(self.bact))
+
+	def _transpose(self):
+		if self._t_indptr is None:
+			rows = np.repeat(np.arange(len(self.ec), dtype=np.int32), np.diff(self.indptr))
+			order = np.argsort(self.indices, kind='mergesort')
+			# stable, so ECs stay in row order within each bacterium
+			self._t_indices = rows[order]
+			counts = np.bincount(self.indices, minlength=len(self.bact))
+			self._t_indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+		return None
+
+	def row_index(self, ec):
+		if self._row_of is None:
+			self._row_of = dict((e, i) for i, e in enumerate(self.ec.tolist()))
+		return self._row_of[ec]
+
+	def col_index(self, bact):
+		if self._col_of is None:
+			self._col_of = dict((b, j) for j, b in enumerate(self.bact.tolist()))
+		return self._col_of[bact]
+
+	def row(self, ec):
+		'''
+		Bacteria that encode this EC (list of strings).
+		'''
+		i = self.row_index(ec)
+		return self.bact[self.indices[self.indptr[i]:self.indptr[i+1]]].tolist()
+
+	def col(self, bact):
+		'''
+		ECs encoded by this bacterium (list of strings), in row order.
+		'''
+		self._transpose()
+		j = self.col_index(bact)
+		return self.ec[self._t_indices[self._t_indptr[j]:self._t_indptr[j+1]]].tolist()
+
+	def iter_rows(self):
+		'''
+		Generator of (ec, list of bacteria) tuples, in row order.
+		'''
+		lst_ec = self.ec.tolist()
+		for i in range(len(lst_ec)):
+			yield (lst_ec[i], self.bact[self.indices[self.indptr[i]:self.indptr[i+1]]].tolist())
+
+	def iter_bact_ec(self):
+		'''
+		Generator of (bacterium, list of ECs) tuples, one bacterium at a
+		time, i.e. the items of dict_bact_ec.
+		'''
+		self._transpose()
+		lst_bact = self.bact.tolist()
+		for j in range(len(lst_bact)):
+			yield (lst_bact[j], self.ec[self._t_indices[self._t_indptr[j]:self._t_indptr[j+1]]].tolist())
+
+	def dict_bact_ec(self):
+		'''
+		key - bacteria names (string)
+		value - list of enzymes (list of strings)
+		'''
+		return dict(self.iter_bact_ec())
@@ -0,0 +1,263 @@
+'''
+
+fetch_functions
+~~~~~~~~~~~~~
+
+Contains functions that fetch raw text from the KEGG REST API.
+Entries are fetched by a bounded pool of threads that reuse
+keep-alive connections, under a shared request rate limit.
+
+python 2.7.5
+
+'''
+import threading
+import time
+from contextlib import closing
+from multiprocessing.pool import ThreadPool
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from flatfile_functions import split_entries, entry_ec, TruncatedEntry
+
+
+kegg_rest = 'http://rest.kegg.jp/'
+# point this to a local stand-in server to run without network access
+
+_local = threading.local()
+
+
+class RateLimiter(object):
+	'''
+	Spread request start times so that at most `rate` requests
+	are started per second, across all threads.
+	'''
+	def __init__(self, rate):
+		self.interval = 1. / rate if rate else 0.
+		self.lock = threading.Lock()
+		self.next_time = 0.
+
+	def wait(self):
+		if not self.interval:
+			return None
+		with self.lock:
+			now = time.time()
+			start = max(now, self.next_time)
+			self.next_time = start + self.interval
+		if start > now:
+			time.sleep(start - now)
+		return None
+
+
+def _session():
+	'''
+	Return the keep-alive session of the calling thread.
+	'''
+	if not hasattr(_local, 'session'):
+		s = requests.Session()
+		adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+		s.mount('http://', adapter)
+		s.mount('https://', adapter)
+		_local.session = s
+	return _local.session
+
+
+def get_text(path, base_url=kegg_rest, limiter=None, retries=3, cache=None):
+	'''
+	Request one KEGG REST path, e.g. 'list/enzyme' or 'get/1.1.1.1'.
+
+	Parameters
+	----------
+	path : string
+		Path relative to base_url
+	base_url : string
+		Root of the KEGG REST API. End this string with '/'
+	limiter : RateLimiter or None
+		Shared rate limiter
+	retries : int
+		Number of attempts before giving up
+	cache : cache_functions.ResponseCache or None
+		Serve the response from, and save it to, this cache
+
+	Returns
+	-------
+	text : string
+		Response body. Empty string if the entry does not exist (404).
+	'''
+	if cache is not None:
+		text = cache.get(path)
+		if text is not None:
+			return text
+		text = get_text(path, base_url=base_url, limiter=limiter, retries=retries)
+		cache.put(path, text)
+		return text
+	s = _session()
+	for attempt in range(retries):
+		if limiter is not None:
+			limiter.wait()
+		try:
+			r = s.get(base_url + path, timeout=60)
+			if r.status_code == 404:
+				return ''
+			r.raise_for_status()
+			return r.text
+		except requests.RequestException:
+			if attempt == retries - 1:
+				raise
+			time.sleep(2 ** attempt)
+
+
+def get_batch(batch, base_url=kegg_rest, limiter=None, retries=3, cache=None):
+	'''
+	Request several enzyme entries in one `get/ec:a+ec:b+...` call
+	and split the response back into single entries.
+
+	Parameters
+	----------
+	batch : list of strings
+		EC numbers. KEGG accepts at most 10 entries per request.
+	base_url : string
+		Root of the KEGG REST API. End this string with '/'
+	limiter : RateLimiter or None
+		Shared rate limiter
+	retries : int
+		Number of attempts before giving up on the batch
+	cache : cache_functions.ResponseCache or None
+		Serve entries from, and save them to, this cache.
+		Entries are cached one by one as 'get/<ec>'.
+
+	Returns
+	-------
+	dict_text : dict
+		key - EC number (string)
+		value - entry text (string). Empty string if the entry does not
+		exist (404).
+
+	A response that ends inside an entry is retried. ECs missing from a
+	complete response are requested one by one with get_text, which
+	tells a deleted EC (404) apart from a lost entry.
+	'''
+	if cache is not None:
+		dict_text = {}
+		for ec in batch:
+			text = cache.get('get/' + ec)
+			if text is not None:
+				dict_text[ec] = text
+		missing = [ec for ec in batch if ec not in dict_text]
+		if missing:
+			dict_new = get_batch(missing, base_url=base_url, limiter=limiter, retries=retries)
+			for ec in missing:
+				cache.put('get/' + ec, dict_new[ec])
+			dict_text.update(dict_new)
+		return dict_text
+	path = 'get/' + '+'.join('ec:' + ec for ec in batch)
+	s = _session()
+	for attempt in range(retries):
+		if limiter is not None:
+			limiter.wait()
+		try:
+			with closing(s.get(base_url + path, timeout=60, stream=True)) as r:
+				# a streamed response goes back to the keep-alive pool only when closed
+				dict_text = {}
+				if r.status_code != 404:
+					r.raise_for_status()
+					if r.encoding is None:
+						r.encoding = 'utf-8'
+					for text in split_entries(r.iter_lines(decode_unicode=True)):
+						dict_text[entry_ec(text)] = text
+			break
+		except (requests.RequestException, TruncatedEntry):
+			if attempt == retries - 1:
+				raise
+			time.sleep(2 ** attempt)
+
+	for ec in batch:
+		if ec not in dict_text:
+			dict_text[ec] = get_text('get/' + ec, base_url=base_url, limiter=limiter, retries=retries)
+	# a 404 of the whole batch or an entry left out is confirmed per EC
+	return dict_text
+
+
+def fetch_entries(lst_ec, n_threads=8, rate_limit=3., base_url=kegg_rest, batch_size=1, cache=None):
+	'''
+	Fetch `get/<ec>` for every EC number, exactly once each.
+	With batch_size > 1, ECs are grouped into multi-entry requests.
+	A batch that keeps failing is retried one EC at a time,
+	so a single bad entry does not lose the rest of its batch.
+
+	Parameters
+	----------
+	lst_ec : list of strings
+		EC numbers, e.g. '1.1.1.1'
+	n_threads : int
+		Number of concurrent requests
+	rate_limit : float or None
+		Maximum number of requests started per second.
+		KEGG asks for no more than 3. None disables the limit.
+	base_url : string
+		Root of the KEGG REST API. End this string with '/'
+	batch_size : int
+		Number of entries per request, at most 10
+	cache : cache_functions.ResponseCache or None
+		Serve entries from, and save them to, this cache
+
+	Returns
+	-------
+	Generator of (ec, text) tuples, in the order of lst_ec.
+	text is an empty string for ECs that do not exist.
+	'''
+	limiter = RateLimiter(rate_limit)
+
+	def fetch(ec):
+		return [(ec, get_text('get/' + ec, base_url=base_url, limiter=limiter, cache=cache))]
+
+	def fetch_batch(batch):
+		try:
+			dict_text = get_batch(batch, base_url=base_url, limiter=limiter, cache=cache)
+		except (requests.RequestException, TruncatedEntry):
+			return [x for ec in batch for x in fetch(ec)]
+		return [(ec, dict_text[ec]) for ec in batch]
+
+	if batch_size > 1:
+		batches = [lst_ec[i:i+batch_size] for i in range(0, len(lst_ec), batch_size)]
+		task, items = fetch_batch, batches
+	else:
+		task, items = fetch, lst_ec
+
+	pool = ThreadPool(n_threads)
+	try:
+		for result in pool.imap(task, items):
+			for item in result:
+				yield item
+	finally:
+		pool.terminate()
+		pool.join()
+
+
+def fetch_paths(lst_path, n_threads=8, rate_limit=3., base_url=kegg_rest, cache=None):
+	'''
+	Fetch arbitrary KEGG REST paths, e.g. 'link/ec/eco', concurrently.
+
+	Parameters
+	----------
+	lst_path : list of strings
+		Paths relative to base_url
+	n_threads, rate_limit, base_url, cache :
+		See fetch_entries
+
+	Returns
+	-------
+	Generator of (path, text) tuples, in the order of lst_path.
+	'''
+	limiter = RateLimiter(rate_limit)
+
+	def fetch(path):
+		return (path, get_text(path, base_url=base_url, limiter=limiter, cache=cache))
+
+	pool = ThreadPool(n_threads)
+	try:
+		for item in pool.imap(fetch, lst_path):
+			yield item
+	finally:
+		pool.terminate()
+		pool.join()
@@ -0,0 +1,183 @@
+'''
+
+flatfile_functions
+~~~~~~~~~~~~~
+
+Contains a streaming parser for KEGG flat files, i.e. the text
+returned by the KEGG REST `get` endpoint.
+
+A flat file is a sequence of entries, each ending with a '///' line.
+Inside an entry the first 12 columns hold the section name (ENTRY, NAME,
+GENES, ...); continuation lines leave these columns blank.
+
+python 2.7.5
+
+'''
+import re
+
+
+_reac_pattern = re.compile(r'R\d{5}')
+
+
+class TruncatedEntry(ValueError):
+	'''
+	A flat file that ends inside an entry, e.g. a response cut off by a
+	dropped connection.
+	'''
+	pass
+
+
+def split_entries(lines):
+	'''
+	Split a concatenated KEGG flat file into single entries.
+
+	Parameters
+	----------
+	lines : iterable of strings
+		Lines of a `get` response, possibly holding several entries
+
+	Returns
+	-------
+	Generator of strings, one per entry, each ending with '///'.
+	Raises TruncatedEntry if the last entry has no terminator.
+	'''
+	entry = []
+	for line in lines:
+		entry.append(line)
+		if line.startswith('///'):
+			yield '\n'.join(entry) + '\n'
+			entry = []
+	if ''.join(entry).strip():
+		raise TruncatedEntry('Flat file ends without \'///\'')
+
+
+def entry_ec(text):
+	'''
+	Return the EC number in the ENTRY line of an enzyme entry,
+	e.g. 'ENTRY       EC 1.1.1.1      Enzyme' -> '1.1.1.1'.
+	None if the entry has no ENTRY line.
+	'''
+	for line in text.splitlines():
+		if line.startswith('ENTRY'):
+			words = line.split()
+			if len(words) > 2 and words[1] == 'EC':
+				return words[2]
+			return words[1] if len(words) > 1 else None
+	return None
+
+
+def iter_sections(lines):
+	'''
+	Group the lines of one entry by section.
+
+	Returns
+	-------
+	Generator of (name, list of strings) tuples. The strings are the
+	section contents with the 12-column name field removed. Subsections
+	(e.g. '  ORGANISM') are kept with the section above them.
+	'''
+	name = None
+	content = []
+	for line in lines:
+		if line.startswith('///'):
+			break
+		if line[:1].strip():
+			if name is not None:
+				yield (name, content)
+			name = line[:12].strip()
+			content = []
+		content.append(line[12:].rstrip())
+	if name is not None:
+		yield (name, content)
+
+
+def parse_entry(text):
+	'''
+	Parse one enzyme entry.
+
+	Parameters
+	----------
+	text : string
+		A single KEGG flat-file entry
+
+	Returns
+	-------
+	record : dictionary or None
+		'ENTRY' - EC number, e.g. '1.1.1.1' (string)
+		'sections' - names of all sections in the entry (set of strings)
+		'GENES' - organism codes in upper case, e.g. 'ECO' (set of strings)
+		'ALL_REAC' - reaction IDs, e.g. 'R00623' (list of strings)
+		'DBLINKS' - key: database name, value: list of IDs (dict)
+		None if the text holds no entry.
+	'''
+	record = {'ENTRY': None, 'sections': set(), 'GENES': set(), 'ALL_REAC': [], 'DBLINKS': {}}
+	for name, content in iter_sections(text.splitlines()):
+		record['sections'].add(name)
+		if name == 'ENTRY':
+			words = content[0].split()
+			if len(words) > 1 and words[0] == 'EC':
+				record['ENTRY'] = words[1]
+			elif words:
+				record['ENTRY'] = words[0]
+		elif name == 'GENES':
+			for line in content:
+				org = line.split(':', 1)[0].strip()
+				if ':' in line and org.isalnum():
+					# wrapped gene lists continue without the organism code
+					record['GENES'].add(org.upper())
+		elif name == 'ALL_REAC':
+			for line in content:
+				record['ALL_REAC'].extend(_reac_pattern.findall(line))
+		elif name == 'DBLINKS':
+			db = None
+			for line in content:
+				if ': ' in line:
+					db, ids = line.split(': ', 1)
+					db = db.strip()
+				else:
+					ids = line
+				if db is not None:
+					record['DBLINKS'].setdefault(db, []).extend(ids.split())
+	if record['ENTRY'] is None:
+		return None
+	return record
+
+
+def iter_records(lines):
+	'''
+	Stream parsed records out of a (possibly multi-entry) flat file.
+
+	Parameters
+	----------
+	lines : iterable of strings
+		Lines of a `get` response
+
+	Returns
+	-------
+	Generator of records, see parse_entry.
+	'''
+	for text in split_entries(lines):
+		record = parse_entry(text)
+		if record is not None:
+			yield record
+
+
+def ec_bacteria(record, set_abbr):
+	'''
+	Bacteria that encode this enzyme, as the intersection of its GENES
+	organisms with set_abbr. None if the entry has no GENES or DBLINKS
+	section (deleted / transferred entries).
+	'''
+	if record is None or 'GENES' not in record['sections'] or 'DBLINKS' not in record['sections']:
+		return None
+	return list(record['GENES'] & set_abbr)
+
+
+def ec_reactions(record):
+	'''
+	Reactions this enzyme catalyzes. None if the entry has no ALL_REAC
+	or SUBSTRATE section (deleted / transferred entries).
+	'''
+	if record is None or 'ALL_REAC' not in record['sections'] or 'SUBSTRATE' not in record['sections']:
+		return None
+	return record['ALL_REAC']
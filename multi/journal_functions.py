@@ -0,0 +1,142 @@
+'''
+
+journal_functions
+~~~~~~~~~~~~~
+
+Contains a checkpoint journal for the KEGG database download.
+
+Every enzyme entry is appended to a text journal as soon as it has
+been parsed, so an interrupted download can be resumed from the last
+committed EC. The first line of the journal describes the run (date,
+source and full or incremental mode), the second lists the bacteria the
+download was started with; each following line holds one EC:
+
+EC <tab> GENES flag <tab> bacteria <tab> ALL_REAC flag <tab> reactions
+
+The flags are '1' if the entry had the section and '0' otherwise.
+Bacteria and reactions are separated by ','.
+
+python 2.7.5
+
+'''
+import os
+
+import ec_matrix_functions as emf
+
+
+class DownloadJournal(object):
+	'''
+	Append-only journal of parsed enzyme entries.
+
+	Parameters
+	----------
+	filename : string
+		Path of the journal file. An existing journal that was started
+		by the same run (date, source, mode) with the same bacteria is
+		resumed; otherwise a new one is started.
+	lst_abbr : list of strings
+		Abbrieviations of bacteria, in column order
+	date : string
+		Date of the run, e.g. '2017-11-10'
+	source : string
+		'genes' or 'link', see multi_utils.request_api
+	mode : string
+		'full', or 'incremental <date of the previous snapshot>'
+	sync_every : int
+		Force the journal to disk after this many records
+	'''
+	def __init__(self, filename, lst_abbr, date, source='genes', mode='full', sync_every=50):
+		self.filename = filename
+		self.lst_abbr = lst_abbr
+		self.sync_every = sync_every
+		self.done = {}
+		# key - EC number (string)
+		# value - (bacteria list or None, reaction list or None)
+		self.count = 0
+		header = 'RUN\t' + '\t'.join((date, source, mode)) + '\n' + 'BACTERIA\t' + ','.join(lst_abbr) + '\n'
+		# records of another day, source or mode are not resumed
+
+		if os.path.exists(filename) and self._load(header):
+			print('>>> Resuming download: ' + str(len(self.done)) + ' ECs already in ' + filename)
+			self.fp = open(filename, 'a')
+		else:
+			self.fp = open(filename, 'w')
+			self.fp.write(header)
+			self._sync()
+
+	def _load(self, header):
+		'''
+		Read committed records. Returns False if the journal belongs to a
+		different run or list of bacteria. A trailing, half-written line is
+		cut off.
+		'''
+		with open(self.filename, 'r') as fp:
+			data = fp.read()
+		if not data.startswith(header):
+			return False
+		end = data.rfind('\n') + 1
+		for line in data[len(header):end].splitlines():
+			lst = line.split('\t')
+			ec = lst[0]
+			bacts = lst[2].split(',') if lst[2] else []
+			reacs = lst[4].split(',') if lst[4] else []
+			self.done[ec] = (bacts if lst[1] == '1' else None, reacs if lst[3] == '1' else None)
+		if end < len(data):
+			with open(self.filename, 'r+') as fp:
+				fp.truncate(end)
+		return True
+
+	def _sync(self):
+		self.fp.flush()
+		os.fsync(self.fp.fileno())
+		return None
+
+	def record_sets(self, ec, bacts, reacs):
+		'''
+		Commit one enzyme entry given as the bacteria that encode it and
+		the reactions it catalyzes (lists of strings, or None if the entry
+		has no GENES / ALL_REAC).
+		'''
+		self.fp.write('{}\t{}\t{}\t{}\t{}\n'.format(ec,
+			'0' if bacts is None else '1', ','.join(bacts or []),
+			'0' if reacs is None else '1', ','.join(reacs or [])))
+		self.fp.flush()
+		self.done[ec] = (bacts, reacs)
+		self.count = self.count + 1
+		if self.count % self.sync_every == 0:
+			self._sync()
+		return None
+
+	def assemble(self, lst_ec):
+		'''
+		Build the EC - bacteria matrix and the EC - reaction list from the
+		journal, in the order of lst_ec.
+
+		Returns
+		-------
+		matrix : ec_matrix_functions.ECBactMatrix
+			EC - bacteria relations. Rows are the ECs with a GENES section.
+		lst_ec_reac : list of dictionaries
+			Keys 'EC' and 'Reactions', same format as in multi_utils.request_api
+		'''
+		lst_ec_bact = []
+		rows = []
+		lst_ec_reac = []
+		for ec in lst_ec:
+			if ec not in self.done:
+				continue
+			bacts, reacs = self.done[ec]
+			if bacts is not None:
+				lst_ec_bact.append(ec)
+				rows.append(bacts)
+			if reacs is not None:
+				lst_ec_reac.append({"EC":ec, "Reactions":reacs})
+		matrix = emf.ECBactMatrix.from_sets(lst_ec_bact, self.lst_abbr, rows)
+		return [matrix, lst_ec_reac]
+
+	def close(self, remove=False):
+		self._sync()
+		self.fp.close()
+		if remove:
+			os.remove(self.filename)
+		return None
@@ -0,0 +1,278 @@
+'''
+
+kegg_stand_in
+~~~~~~~~~~~~~
+
+A local stand-in for the KEGG REST API, to run and time request_api()
+without network access.
+
+The server answers `list/...`, `link/...` and `get/<ec>` requests
+(including multi-entry `get/ec:a+ec:b` requests) from a catalog, i.e.
+a dictionary that maps request paths to response bodies. A catalog is
+either read from a fixtures directory laid out like the API
+(fixtures/list/organism, fixtures/get/1.1.1.1, ...) or generated
+synthetically at any size. Latency and errors can be injected.
+
+Usage:
+	python kegg_stand_in.py --fixtures fixtures/ --port 8000
+	python kegg_stand_in.py --synthetic 5000 7000 --latency 0.05 --error-rate 0.01
+
+and set base_url='http://127.0.0.1:8000/' in multi_utils.request_api.
+
+python 2.7.5
+
+'''
+import argparse
+import os
+import random
+import socket
+import threading
+import time
+
+try:
+	from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+	from SocketServer import ThreadingMixIn
+except ImportError:
+	from http.server import HTTPServer, BaseHTTPRequestHandler
+	from socketserver import ThreadingMixIn
+
+
+def load_fixtures(fixtures_dir):
+	'''
+	Read a fixtures directory into a catalog.
+
+	Parameters
+	----------
+	fixtures_dir : string
+		Directory laid out like the API, e.g. fixtures/get/1.1.1.1
+		holds the response of 'get/1.1.1.1'. End this string with '/'
+
+	Returns
+	-------
+	catalog : dict
+		key - request path (string)
+		value - response body (string)
+	'''
+	catalog = {}
+	for root, dirs, files in os.walk(fixtures_dir):
+		for name in files:
+			filename = os.path.join(root, name)
+			path = os.path.relpath(filename, fixtures_dir).replace(os.sep, '/')
+			with open(filename, 'r') as fp:
+				catalog[path] = fp.read()
+	return catalog
+
+
+def synthetic_catalog(n_bact, n_ec, n_org_per_ec=200, n_reac_per_ec=3, n_euk=10, seed=0):
+	'''
+	Generate a catalog of any size in the KEGG formats.
+
+	Parameters
+	----------
+	n_bact : int
+		Number of bacteria
+	n_ec : int
+		Number of enzymes
+	n_org_per_ec : int
+		Average number of organisms in the GENES section of an enzyme
+	n_reac_per_ec : int
+		Number of reactions in the ALL_REAC section of an enzyme
+	n_euk : int
+		Number of non-bacterial organisms
+	seed : int
+		Seed of the random generator
+
+	Returns
+	-------
+	catalog : dict
+		See load_fixtures
+	'''
+	rng = random.Random(seed)
+	lst_org = ['b%05d' % i for i in range(n_bact)] + ['e%05d' % i for i in range(n_euk)]
+	lst_ec = ['%d.%d.%d.%d' % (1 + i % 7, 1 + (i // 7) % 20, 1 + (i // 140) % 50, 1 + i // 7000) for i in range(n_ec)]
+
+	catalog = {}
+	lines = []
+	for i, org in enumerate(lst_org):
+		kind = 'Prokaryotes;Bacteria;Synthetic' if org.startswith('b') else 'Eukaryotes;Animals;Synthetic'
+		lines.append('T%05d\t%s\tSynthetic organism %s\t%s' % (i, org, org, kind))
+	catalog['list/organism'] = '\n'.join(lines) + '\n'
+	catalog['list/enzyme'] = ''.join('ec:%s\tsynthetic enzyme %d\n' % (ec, i) for i, ec in enumerate(lst_ec))
+
+	dict_org_ec = {}
+	lst_link_reac = []
+	for i, ec in enumerate(lst_ec):
+		k = min(len(lst_org), max(0, int(rng.expovariate(1. / n_org_per_ec))))
+		orgs = sorted(rng.sample(lst_org, k))
+		reacs = ['R%05d' % rng.randint(1, 12000) for j in range(n_reac_per_ec)]
+		genes = []
+		for org in orgs:
+			genes.append('%-12s%s: %s' % ('GENES' if not genes else '', org.upper(), ' '.join('g%d' % rng.randint(1, 9999) for j in range(rng.randint(1, 3)))))
+			dict_org_ec.setdefault(org, []).append(ec)
+		entry = ['%-12s%-24s%s' % ('ENTRY', 'EC ' + ec, 'Enzyme'),
+			'%-12s%s' % ('NAME', 'synthetic enzyme %d;' % i),
+			'%-12s%s;' % ('ALL_REAC', ' '.join(reacs)),
+			'%-12s%s' % ('SUBSTRATE', 'synthetic compound [CPD:C%05d]' % rng.randint(1, 20000))]
+		entry.extend(genes)
+		entry.append('%-12s%s' % ('DBLINKS', 'ExplorEnz - The Enzyme Database: ' + ec))
+		entry.append('///')
+		catalog['get/' + ec] = '\n'.join(entry) + '\n'
+		lst_link_reac.extend('ec:%s\trn:%s' % (ec, x) for x in reacs)
+
+	for org in lst_org:
+		catalog['link/ec/' + org] = ''.join('%s:g%d\tec:%s\n' % (org, j, ec) for j, ec in enumerate(dict_org_ec.get(org, [])))
+	catalog['link/reaction/enzyme'] = '\n'.join(lst_link_reac) + '\n'
+
+	return catalog
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+	protocol_version = 'HTTP/1.1'
+	# keep-alive, like rest.kegg.jp
+	wbufsize = -1
+	disable_nagle_algorithm = True
+	# send header and body in one packet, no delayed-ACK stalls
+
+	def log_message(self, *args):
+		return None
+
+	def _body(self, path):
+		catalog = self.server.catalog
+		if path.startswith('get/'):
+			entries = []
+			for name in path[len('get/'):].split('+'):
+				if name.startswith('ec:'):
+					name = name[len('ec:'):]
+				if 'get/' + name in catalog:
+					entries.append(catalog['get/' + name])
+			return ''.join(entries) if entries else None
+		return catalog.get(path)
+
+	def do_GET(self):
+		server = self.server
+		with server.lock:
+			server.n_requests = server.n_requests + 1
+		if server.latency:
+			time.sleep(server.latency)
+		if server.error_rate and server.rng.random() < server.error_rate:
+			status, body = 503, ''
+		else:
+			body = self._body(self.path.lstrip('/'))
+			status = 404 if body is None else 200
+			body = body or ''
+		data = body.encode('utf-8')
+		self.send_response(status)
+		self.send_header('Content-Type', 'text/plain; charset=utf-8')
+		self.send_header('Content-Length', str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+		with server.lock:
+			server.n_bytes = server.n_bytes + len(data)
+
+
+class _ThreadingServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+
+	def process_request(self, request, client_address):
+		with self.lock:
+			self.connections.add(request)
+		return ThreadingMixIn.process_request(self, request, client_address)
+
+	def shutdown_request(self, request):
+		with self.lock:
+			self.connections.discard(request)
+		return HTTPServer.shutdown_request(self, request)
+
+	def close_connections(self):
+		'''
+		Close keep-alive connections that clients left open, so that
+		their handler threads finish.
+		'''
+		with self.lock:
+			connections = list(self.connections)
+		for request in connections:
+			try:
+				request.shutdown(socket.SHUT_RDWR)
+			except socket.error:
+				pass
+		deadline = time.time() + 5.
+		while self.connections and time.time() < deadline:
+			time.sleep(0.01)
+		return None
+
+
+class StandInServer(object):
+	'''
+	Local KEGG REST stand-in, running in a background thread.
+
+	Parameters
+	----------
+	catalog : dict
+		key - request path, value - response body. See load_fixtures
+		and synthetic_catalog.
+	port : int
+		Port to listen on. 0 picks a free port.
+	latency : float
+		Seconds to wait before answering each request
+	error_rate : float
+		Probability of answering a request with '503 Service Unavailable'
+	seed : int
+		Seed of the error injection
+
+	Attributes
+	----------
+	url : string
+		Base URL to pass to request_api(base_url=...)
+	'''
+	def __init__(self, catalog, port=0, latency=0., error_rate=0., seed=0):
+		self.httpd = _ThreadingServer(('127.0.0.1', port), _Handler)
+		self.httpd.catalog = catalog
+		self.httpd.latency = latency
+		self.httpd.error_rate = error_rate
+		self.httpd.rng = random.Random(seed)
+		self.httpd.lock = threading.Lock()
+		self.httpd.connections = set()
+		self.httpd.n_requests = 0
+		self.httpd.n_bytes = 0
+		self.url = 'http://127.0.0.1:%d/' % self.httpd.server_address[1]
+		self.thread = None
+
+	@property
+	def n_requests(self):
+		return self.httpd.n_requests
+
+	@property
+	def n_bytes(self):
+		return self.httpd.n_bytes
+
+	def start(self):
+		self.thread = threading.Thread(target=self.httpd.serve_forever)
+		self.thread.daemon = True
+		self.thread.start()
+		return self
+
+	def stop(self):
+		self.httpd.shutdown()
+		self.httpd.close_connections()
+		self.httpd.server_close()
+		self.thread.join()
+		return None
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Local stand-in for the KEGG REST API.')
+	parser.add_argument('--fixtures', help='fixtures directory laid out like the API')
+	parser.add_argument('--synthetic', nargs=2, type=int, metavar=('N_BACT', 'N_EC'), help='generate a synthetic catalog')
+	parser.add_argument('--port', type=int, default=8000)
+	parser.add_argument('--latency', type=float, default=0.)
+	parser.add_argument('--error-rate', type=float, default=0.)
+	args = parser.parse_args()
+
+	if args.synthetic:
+		catalog = synthetic_catalog(n_bact=args.synthetic[0], n_ec=args.synthetic[1])
+	else:
+		catalog = load_fixtures(args.fixtures or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures') + '/')
+	server = StandInServer(catalog, port=args.port, latency=args.latency, error_rate=args.error_rate)
+	print('>>> Serving ' + str(len(catalog)) + ' KEGG responses at ' + server.url)
+	server.httpd.serve_forever()
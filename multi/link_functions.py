@@ -0,0 +1,119 @@
+'''
+
+link_functions
+~~~~~~~~~~~~~
+
+Contains functions that build EC - bacteria and EC - reaction relations
+from the KEGG `link` endpoints instead of the full enzyme entries.
+
+`link/ec/<org>` lists the enzymes of one organism ('eco:b0002<tab>ec:2.7.2.4'),
+and `link/reaction/enzyme` lists every EC - reaction relation in a single
+response ('ec:1.1.1.1<tab>rn:R00623'). Together they replace one `get`
+request per EC and the substring search for bacteria in the GENES text.
+
+python 2.7.5
+
+'''
+import fetch_functions as ff
+
+
+def _parse_link(text):
+	'''
+	Split a link response into (source, target) tuples.
+	'''
+	pairs = []
+	for line in text.encode('ascii','ignore').splitlines():
+		lst = line.split('\t')
+		if len(lst) > 1:
+			pairs.append((lst[0], lst[1]))
+	return pairs
+
+
+def link_bact_ec(lst_abbr, n_threads=8, rate_limit=3., base_url=ff.kegg_rest, cache=None):
+	'''
+	Obtain the enzymes of each bacterium from `link/ec/<org>`.
+
+	Parameters
+	----------
+	lst_abbr : list of strings
+		Abbrieviations of bacteria (upper case, as in the EC - bacteria file)
+	n_threads, rate_limit, base_url, cache :
+		See fetch_functions.fetch_entries
+
+	Returns
+	-------
+	dict_bact_ec : dict
+		key - bacteria names (string)
+		value - set of enzymes (set of strings)
+	'''
+	lst_path = ['link/ec/' + x.lower() for x in lst_abbr]
+	dict_bact_ec = {}
+	for abbr, (path, text) in zip(lst_abbr, ff.fetch_paths(lst_path, n_threads=n_threads, rate_limit=rate_limit, base_url=base_url, cache=cache)):
+		dict_bact_ec[abbr] = set(x[1].replace('ec:', '') for x in _parse_link(text))
+	return dict_bact_ec
+
+
+def link_ec_reac(base_url=ff.kegg_rest, cache=None):
+	'''
+	Obtain the reactions of every enzyme from `link/reaction/enzyme`.
+
+	Returns
+	-------
+	dict_ec_reac : dict
+		key - enzymes (string)
+		value - list of reactions (list of strings)
+	'''
+	text = ff.get_text('link/reaction/enzyme', base_url=base_url, cache=cache)
+	dict_ec_reac = {}
+	for ec, reac in _parse_link(text):
+		dict_ec_reac.setdefault(ec.replace('ec:', ''), []).append(reac.replace('rn:', ''))
+	return dict_ec_reac
+
+
+def invert(dict_bact_ec):
+	'''
+	Turn bacterium -> enzymes into enzyme -> bacteria.
+
+	Returns
+	-------
+	dict_ec_bact : dict
+		key - enzymes (string)
+		value - list of bacteria names (list of strings)
+	'''
+	dict_ec_bact = {}
+	for bact, set_ec in dict_bact_ec.items():
+		for ec in set_ec:
+			dict_ec_bact.setdefault(ec, []).append(bact)
+	return dict_ec_bact
+
+
+def link_journal(journal, lst_ec, abbr_of_bacteria, n_threads=8, rate_limit=3., base_url=ff.kegg_rest, cache=None):
+	'''
+	Commit the EC - bacteria and EC - reaction relations of every EC in
+	lst_ec to the download journal, using only `link` requests.
+	ECs linked to no bacterium get no EC - bacteria row, and ECs linked to
+	no reaction get no EC - reaction row.
+
+	Parameters
+	----------
+	journal : journal_functions.DownloadJournal
+		Journal of the running download
+	lst_ec : list of strings
+		EC numbers
+	abbr_of_bacteria : list of strings
+		Abbrieviations of bacteria
+	n_threads, rate_limit, base_url, cache :
+		See fetch_functions.fetch_entries
+
+	Returns
+	-------
+	None
+	'''
+	print('>>> Requesting enzyme links of ' + str(len(abbr_of_bacteria)) + ' bacteria...')
+	dict_ec_bact = invert(link_bact_ec(abbr_of_bacteria, n_threads=n_threads, rate_limit=rate_limit, base_url=base_url, cache=cache))
+	print('>>> Requesting enzyme - reaction links...')
+	dict_ec_reac = link_ec_reac(base_url=base_url, cache=cache)
+	for ec in lst_ec:
+		if ec not in journal.done:
+			journal.record_sets(ec, dict_ec_bact.get(ec), dict_ec_reac.get(ec))
+	return None
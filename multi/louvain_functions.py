@@ -0,0 +1,177 @@
+'''
+
+louvain_functions
+~~~~~~~~~~~~~
+
+Contains an in-process Louvain method for directed graphs, in place of
+kegg_louvain.sh (convert, community and hierarchy of the directed
+Louvain code).
+
+Directed modularity (Leicht and Newman 2008):
+
+	Q = 1/m sum_ij [A_ij - k_i^out k_j^in / m] delta(c_i, c_j)
+
+Moving node i into community C changes m*Q by
+
+	k_i,C - (k_i^out tot_in(C) + k_i^in tot_out(C)) / m
+
+where k_i,C is the weight of the edges from i to C and from C to i.
+Nodes are moved one by one while modularity improves, then every
+community becomes one node of a new graph (edge weights summed, edges
+inside a community become self-loops), and so on until nothing moves.
+The partition of the last level is returned, as the highest level that
+kegg_louvain.sh hands to hierarchy.
+
+The graph is given as two arrays of node labels (e.g. compound IDs) and
+the partition comes back as an array aligned with the sorted labels,
+without renumbering files.
+
+python 2.7.5
+
+'''
+import random
+
+import numpy as np
+
+import compound_functions as cpf
+
+
+def _merge(src, dest, weight):
+	# sum the weights of parallel edges
+	keys = cpf.pack(src, dest)
+	[keys, inverse] = np.unique(keys, return_inverse=True)
+	weight = np.bincount(inverse, weights=weight)
+	[src, dest] = cpf.unpack(keys)
+	return [src, dest, weight]
+
+
+def modularity(src, dest, weight, community):
+	'''
+	Directed modularity of a partition.
+
+	Parameters
+	----------
+	src, dest : numpy arrays of int
+		Edges, as node indices 0 .. n-1
+	weight : numpy array of float
+	community : numpy array of int
+		Community of every node
+
+	Returns
+	-------
+	Q : float
+	'''
+	m = float(weight.sum())
+	if m == 0:
+		return 0.
+	n_comm = int(community.max()) + 1
+	tot_out = np.bincount(community[src], weights=weight, minlength=n_comm)
+	tot_in = np.bincount(community[dest], weights=weight, minlength=n_comm)
+	internal = weight[community[src] == community[dest]].sum()
+	return internal / m - (tot_out * tot_in).sum() / (m * m)
+
+
+def _one_level(n, src, dest, weight, order, min_gain):
+	m = float(weight.sum())
+	k_out = np.bincount(src, weights=weight, minlength=n).tolist()
+	k_in = np.bincount(dest, weights=weight, minlength=n).tolist()
+	neighbors = [[] for i in range(n)]
+	for i, j, w in zip(src.tolist(), dest.tolist(), weight.tolist()):
+		if i != j:
+			neighbors[i].append((j, w))
+			neighbors[j].append((i, w))
+	# edges in both directions count towards k_i,C
+
+	community = list(range(n))
+	tot_out = list(k_out)
+	tot_in = list(k_in)
+	moved = False
+	q = modularity(src, dest, weight, np.arange(n))
+	while True:
+		n_moves = 0
+		for i in order:
+			ci = community[i]
+			weight_to = {}
+			for j, w in neighbors[i]:
+				cj = community[j]
+				weight_to[cj] = weight_to.get(cj, 0.) + w
+
+			tot_out[ci] -= k_out[i]
+			tot_in[ci] -= k_in[i]
+			best = ci
+			best_gain = weight_to.get(ci, 0.) - (k_out[i] * tot_in[ci] + k_in[i] * tot_out[ci]) / m
+			for c, w in weight_to.items():
+				gain = w - (k_out[i] * tot_in[c] + k_in[i] * tot_out[c]) / m
+				if gain > best_gain:
+					best = c
+					best_gain = gain
+			tot_out[best] += k_out[i]
+			tot_in[best] += k_in[i]
+			if best != ci:
+				community[i] = best
+				n_moves += 1
+
+		if n_moves == 0:
+			break
+		q_new = modularity(src, dest, weight, np.array(community))
+		moved = True
+		if q_new - q < min_gain:
+			break
+		q = q_new
+
+	return [np.array(community, dtype=np.int64), moved]
+
+
+def louvain(src, dest, weight=None, seed=None, min_gain=1e-7):
+	'''
+	Communities of a directed graph.
+
+	Parameters
+	----------
+	src, dest : numpy arrays of int
+		Edges, as node labels (e.g. compound IDs)
+	weight : numpy array of float or None
+		Edge weights. None gives weight 1 to every edge.
+	seed : int or None
+		Visit the nodes in an order shuffled with this seed. None visits
+		them in the order of their labels, so the result is reproducible.
+	min_gain : float
+		A level stops when a pass over the nodes improves modularity by
+		less than this.
+
+	Returns
+	-------
+	nodes : numpy array
+		Distinct node labels, sorted
+	partition : numpy array of int32
+		Community of every node, numbered 0 .. n_comm-1
+	q : float
+		Modularity of the partition
+	'''
+	src = np.asarray(src)
+	dest = np.asarray(dest)
+	[nodes, inverse] = np.unique(np.concatenate([src, dest]), return_inverse=True)
+	n = len(nodes)
+	if weight is None:
+		weight = np.ones(len(src))
+	[s, d, w] = _merge(inverse[:len(src)], inverse[len(src):], np.asarray(weight, dtype=float))
+	s0 = s
+	d0 = d
+	w0 = w
+	partition = np.arange(n)
+	rng = random.Random(seed)
+
+	while len(s):
+		order = list(range(n))
+		if seed is not None:
+			rng.shuffle(order)
+		[community, moved] = _one_level(n, s, d, w, order, min_gain)
+		if not moved:
+			break
+		[labels, community] = np.unique(community, return_inverse=True)
+		partition = community[partition]
+		n = len(labels)
+		[s, d, w] = _merge(community[s], community[d], w)
+
+	partition = partition.astype(np.int32)
+	return [nodes, partition, modularity(s0, d0, w0, partition)]
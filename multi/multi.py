@@ -1,21 +1,20 @@
-from multiprocessing import Process, Manager, Pool, cpu_count
+from multiprocessing import Pool, cpu_count
 from math import floor
 import os
 from multi_functions import *
-from functools import partial
 import pickle
 
 os.system('taskset -p -c 0-55 %s' % os.getpid())
 # avoid task affinity being messed up. ONLY WORKS ON LINUX.
 
+fused = True
+# True - one task carries a bacterium through all stages (multi_functions.pipeline),
+# with the native Louvain engine.
+# False - one Pool.map per stage, with files in between.
+
 if __name__ == '__main__':
 	info('main line')
 	print 'Reading files...'
-	manager = Manager()
-	lst_bact = manager.list()
-	dict_bact_ec = manager.dict()
-	dict_ec_pairs = manager.dict()
-	
 	file1 = open(r'lst_bact.pkl', 'rb')
 	lst_bact = pickle.load(file1)
 	file1.close()
@@ -28,46 +27,83 @@ if __name__ == '__main__':
 	dict_ec_pairs = pickle.load(file3)
 	file3.close()
 
-	print 'Printing pairs to file...'
+	dict_bact_sp = None
+	if os.path.exists('dict_bact_sp.pkl'):
+		# non-enzymatic reactions added per organism by multi_preparation.py
+		file4 = open(r'dict_bact_sp.pkl', 'rb')
+		dict_bact_sp = pickle.load(file4)
+		file4.close()
+
+	tables_direct = work_direct + 'tables/'
+	stf.write_tables(tables_direct, lst_bact, dict_bact_ec, dict_ec_pairs, dict_bact_sp)
+	del dict_bact_ec, dict_ec_pairs, dict_bact_sp
+	# the workers read the memory-mapped tables; nothing is pickled per task
+
+	stf.attach(tables_direct)
+	groups = stf.group_networks(lst_bact)
+	lst_rep = [group[0] for group in groups]
+	# bacteria with identical networks (e.g. strains of one species) are
+	# computed once, through their representative, and fanned out at the end
+
 	MAXCPU = cpu_count()
-	pool_pairs = Pool(MAXCPU)
-	print '>>> number of processes to use: ' + str(MAXCPU)
-	pairs_par = partial(obtain_pairs, dict_bact_ec=dict_bact_ec, dict_ec_pairs=dict_ec_pairs)
-	pool_pairs.map(pairs_par, lst_bact)
-	pool_pairs.close()
-	pool_pairs.join()
-	print '...Done.'
+	if fused and louvain_engine == 'native':
+		print 'Running the pipeline per bacterium...'
+		print '>>> number of processes to use: ' + str(MAXCPU)
+		pool = Pool(MAXCPU, initializer=stf.attach, initargs=(tables_direct,))
+		count = 0
+		for bact in pool.imap_unordered(pipeline, lst_rep):
+			# results come back as soon as each bacterium is done
+			count = count + 1
+			print '>>> ' + str(count) + '/' + str(len(lst_rep)) + ' done: ' + bact
+		pool.close()
+		pool.join()
+		print '...Done'
+
+	else:
+		print 'Printing pairs to file...'
+		pool_pairs = Pool(MAXCPU, initializer=stf.attach, initargs=(tables_direct,))
+		print '>>> number of processes to use: ' + str(MAXCPU)
+		pool_pairs.map(obtain_pairs_shared, lst_rep)
+		pool_pairs.close()
+		pool_pairs.join()
+		print '...Done.'
 	
-	print 'Calculating modularity using directed Louvain...'
-	cp = int(floor(MAXCPU*1))
-	# avoid memory full issue
-	print 'number of processes to use: ' + str(cp)
-	pool_louvain = Pool(cp)
-	pool_louvain.map(DiLouvain, lst_bact)
-	pool_louvain.close()
-	pool_louvain.join()
-	print '...Done'
+		print 'Calculating modularity using directed Louvain...'
+		cp = int(floor(MAXCPU*1))
+		# avoid memory full issue
+		print 'number of processes to use: ' + str(cp)
+		pool_louvain = Pool(cp)
+		pool_louvain.map(DiLouvain, lst_rep)
+		pool_louvain.close()
+		pool_louvain.join()
+		print '...Done'
 	
-	print 'Start graphing (and remove isolates)...'
-	pool_graph = Pool(cp)
-	pool_graph.map(create_graph, lst_bact)
-	pool_graph.close()
-	pool_graph.join()
-	print '...Done'
+		print 'Start graphing (and remove isolates)...'
+		pool_graph = Pool(cp)
+		pool_graph.map(create_graph, lst_rep)
+		pool_graph.close()
+		pool_graph.join()
+		print '...Done'
 
-	print 'Calculating modularity using directed louvain (after)...'
-	cp = int(floor(MAXCPU*1))
-	# avoid memory full issue
-	print 'number of processes to use: ' + str(cp)
-	pool_louvain = Pool(cp)
-	pool_louvain.map(DiLouvain_after, lst_bact)
-	pool_louvain.close()
-	pool_louvain.join()
-	print '...Done'
+		print 'Calculating modularity using directed louvain (after)...'
+		cp = int(floor(MAXCPU*1))
+		# avoid memory full issue
+		print 'number of processes to use: ' + str(cp)
+		pool_louvain = Pool(cp)
+		pool_louvain.map(DiLouvain_after, lst_rep)
+		pool_louvain.close()
+		pool_louvain.join()
+		print '...Done'
+
+		print 'Start graphing (after)...'
+		pool_graph = Pool(cp)
+		pool_graph.map(create_graph_after, lst_rep)
+		pool_graph.close()
+		pool_graph.join()
+		print '...Done'
 
-	print 'Start graphing (after)...'
-	pool_graph = Pool(cp)
-	pool_graph.map(create_graph_after, lst_bact)
-	pool_graph.close()
-	pool_graph.join()
+	print 'Copying results to bacteria with identical networks...'
+	for group in groups:
+		if len(group) > 1:
+			fan_out(group)
 	print '...Done'
@@ -1,14 +1,21 @@
 import os
+import shutil
 import subprocess
 
 import networkx as nx
 import sys
 from community_functions import *
+import numpy as np
+import shared_table_functions as stf
+import organism_file_functions as off
+import louvain_functions as lvf
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
 import colorsys
 
 work_direct = '/scratch9/fengdan/KEGG/files/'
+louvain_engine = 'native'
+# 'native' - louvain_functions, in this process. 'script' - ./kegg_louvain.sh
 
 def info(title):
     print(title)
@@ -18,54 +25,129 @@ def info(title):
 
     return None
 
-def obtain_pairs(bact, dict_bact_ec, dict_ec_pairs):
+def obtain_pairs_shared(bact):
 	'''
+	Save the full list of reactant pairs of a bacterium: the pairs of its
+	ECs, each once, and the non-enzymatic pairs added per organism. They
+	are read from the lookup tables attached by
+	shared_table_functions.attach in the Pool initializer, so nothing is
+	pickled with every task. The pairs of all bacteria are built there
+	at once (network_batch_functions); this only takes one slice of them.
+
+	With the native Louvain engine the pairs stay dense compound IDs,
+	and the KEGG numbers of the nodes are saved next to them ('compound'
+	in <bact>.net). kegg_louvain.sh gets KEGG numbers.
+
 	bact : string
 		name of the bacteirum
-	dict_bact_ec : dict
-		key - bacteria names (string)
-		value - list of enzymes (list of strings)
-	dict_ec_pairs : dict
-		key - enzymes (string)
-		value - list of reactant pairs (list of tuples)
 	'''
 	info('function obtain_pairs')
-	lst_ec = dict_bact_ec[bact]
-	pairs_full = []
-	for ec in lst_ec:
-		if ec in dict_ec_pairs:
-			lst_pairs = dict_ec_pairs[ec]
-			for pair in lst_pairs:
-				if pair not in pairs_full:
-					pairs_full.append(pair)
-
-	file_name = work_direct + bact + '_pairs_full_directed.txt'
-	with open(file_name,'w') as fp:
-		fp.write('\n'.join('{}\t{}'.format(x[0],x[1]) for x in pairs_full))
+	edges = np.concatenate([stf.network(bact), stf.bact_sp_pairs(bact)])
+	# non-enzymatic reactions added per organism, if any
+	if louvain_engine == 'native':
+		off.update(work_direct + bact + '.net', {'src': edges[:, 0], 'dest': edges[:, 1],
+			'compound': stf.compound_ids(np.unique(edges))})
+	else:
+		edges = stf.compound_ids(edges)
+		_write_edges(bact, '', edges[:, 0], edges[:, 1])
 
 	return None
 
 
-def DiLouvain(bact):
+def _write_edges(bact, suffix, src, dest):
 	'''
-	bact : string
-		name of the bacterium.
+	Save the pairs of a bacterium, suffix '' or '_after'. With the native
+	Louvain engine they go to the binary container <bact>.net
+	(organism_file_functions), otherwise to the text file read by
+	kegg_louvain.sh.
 	'''
-	info('directed louvain')
-	fn = bact + '_pairs_full_directed.txt'
+	if louvain_engine == 'native':
+		off.update(work_direct + bact + '.net', {'src' + suffix: np.asarray(src, dtype=np.int32),
+			'dest' + suffix: np.asarray(dest, dtype=np.int32)})
+	else:
+		file_name = work_direct + bact + '_pairs_full_directed' + suffix + '.txt'
+		with open(file_name,'w') as fp:
+			fp.write('\n'.join('{}\t{}'.format(x, y) for x, y in zip(src, dest)))
+
+	return None
+
+
+def _read_edges(bact, suffix):
+	'''
+	[src, dest] of the pairs of a bacterium saved by _write_edges: int32
+	arrays mapped from the container, or lists of strings from the text
+	file.
+	'''
+	if louvain_engine == 'native':
+		data = off.OrganismFile(work_direct + bact + '.net')
+		return [data['src' + suffix], data['dest' + suffix]]
+
+	fn = bact + '_pairs_full_directed' + suffix + '.txt'
 	file = open(work_direct + fn, 'r')
 	data_edges = file.read()
 	data_lst=data_edges.split('\n')
 	if data_lst[len(data_lst)-1] == '':
 		data_lst = data_lst[:len(data_lst)-1]
 		# remove the empty line at the end if needed
+	edges_lst = [row.split('\t') for row in data_lst]
+	return [[x[0] for x in edges_lst], [x[1] for x in edges_lst]]
+
+
+def _read_partition(bact, suffix):
+	'''
+	Partition of a bacterium (suffix '' or '_after') as a dictionary,
+	key - node label, value - community (int).
+	'''
+	if louvain_engine == 'native':
+		data = off.OrganismFile(work_direct + bact + '.net')
+		return dict(zip(data['nodes' + suffix].tolist(), data['partition' + suffix].tolist()))
+
+	fn = bact + '_pairs_full_directed' + suffix + '.txt'
+	fp_pair_orig = open(work_direct + fn, 'r')
+	fp_pair_new = open(work_direct + fn + '_renum', 'r')
+
+	label_dict = _match_labels(fp_pair_orig = fp_pair_orig, fp_pair_new = fp_pair_new)
+
+	filename_partition = 'partition_' + bact + suffix + '.txt'
+
+	file = open(work_direct + filename_partition, 'r')
+	data_partition = file.read()
+	lst_partition = data_partition.split('\n')
+	if lst_partition[len(lst_partition)-1] == '':
+		lst_partition = lst_partition[:len(lst_partition)-1]
+
+	partition_new = {}
+	for row in lst_partition:
+		lst = row.split(' ')
+		partition_new[lst[0]]=int(lst[1])
+		# lst[0] is a string
+	partition_orig = {}
+	for key, value in partition_new.items():
+		partition_orig[label_dict[key]]=value
 
-	if not data_lst: 
-		# if data_lst is empty
+	return partition_orig
+
+
+def DiLouvain(bact):
+	'''
+	bact : string
+		name of the bacterium.
+	'''
+	info('directed louvain')
+	[src, dest] = _read_edges(bact, '')
+
+	if not len(src):
+		# if there are no pairs
 		print 'This bacterium has empty pairs: ' + bact
+		if louvain_engine == 'native':
+			_louvain_native(bact, '', src, dest)
 		return None
 
-	output = subprocess.check_output(['./kegg_louvain.sh', fn, bact])
+	if louvain_engine == 'native':
+		_louvain_native(bact, '', src, dest)
+	else:
+		fn = bact + '_pairs_full_directed.txt'
+		output = subprocess.check_output(['./kegg_louvain.sh', fn, bact])
 
 	return None
 
@@ -75,20 +157,38 @@ def DiLouvain_after(bact):
 		name of the bacterium.
 	'''
 	info('directed louvain (after)')
-	fn = bact + '_pairs_full_directed_after.txt'
-	file = open(work_direct + fn, 'r')
-	data_edges = file.read()
-	data_lst=data_edges.split('\n')
-	if data_lst[len(data_lst)-1] == '':
-		data_lst = data_lst[:len(data_lst)-1]
-		# remove the empty line at the end if needed
+	[src, dest] = _read_edges(bact, '_after')
 
-	if not data_lst: 
-		# if data_lst is empty
+	if not len(src):
+		# if there are no pairs
+		if louvain_engine == 'native':
+			_louvain_native(bact, '_after', src, dest)
 		return None
 
-	bn = bact + '_after'
-	output = subprocess.check_output(['./kegg_louvain.sh', fn, bn])
+	if louvain_engine == 'native':
+		_louvain_native(bact, '_after', src, dest)
+	else:
+		fn = bact + '_pairs_full_directed_after.txt'
+		bn = bact + '_after'
+		output = subprocess.check_output(['./kegg_louvain.sh', fn, bn])
+
+	return None
+
+
+def _louvain_native(bact, suffix, src, dest):
+	'''
+	Run louvain_functions.louvain on the pairs of a bacterium and save
+	the node labels and their communities in its container. Without
+	pairs, empty arrays are saved: update() keeps the arrays it is not
+	given, and a partition of an earlier run must not stay next to the
+	new pairs.
+	'''
+	if not len(src):
+		off.update(work_direct + bact + '.net', {'nodes' + suffix: np.zeros(0, dtype=np.int32),
+			'partition' + suffix: np.zeros(0, dtype=np.int32)})
+		return None
+	[nodes, partition, q] = lvf.louvain(src, dest)
+	off.update(work_direct + bact + '.net', {'nodes' + suffix: nodes.astype(np.int32), 'partition' + suffix: partition})
 
 	return None
 
@@ -148,54 +248,79 @@ def _match_labels(fp_pair_orig, fp_pair_new):
 	return label_dict
 
 
-def create_graph(bact):
-	info('create_graph')
-	G = nx.DiGraph()
-	fn = bact + '_pairs_full_directed.txt'
-	file = open(work_direct + fn, 'r')
-	data_edges = file.read()
-	data_lst=data_edges.split('\n')
-	if data_lst[len(data_lst)-1] == '':
-		data_lst = data_lst[:len(data_lst)-1]
-		# remove the empty line at the end if needed
+def output_files(bact):
+	'''
+	Names of the files that the pipeline of multi.py writes to
+	work_direct for a bacterium (list of strings). Not all of them exist,
+	e.g. for a bacterium without pairs.
+	'''
+	lst = [bact + '.net']
+	for suffix in ('', '_after'):
+		bn = bact + suffix
+		fn = bact + '_pairs_full_directed' + suffix + '.txt'
+		lst.extend([fn, fn + '_renum', 'graph_' + bn + '.bin', 'graph_' + bn + '.tree',
+			'M_' + bn + '.txt', 'hier_' + bn + '.txt', 'partition_' + bn + '.txt',
+			'hypergraph_' + bn + '.png', 'final_graph_' + bn + '.png'])
+	return lst
 
-	if not data_lst: 
-		# if data_lst is empty
-		filename_edges_after = bact + '_pairs_full_directed_after.txt' 
-		with open(work_direct + filename_edges_after,'w') as fp:
-			fp.write('\n'.join('{}\t{}'.format(x[0],x[1]) for x in G.edges()))
-		return None
 
-	edges_lst = []
-	for row in data_lst:
-		lst = row.split('\t')
-		edges_lst.append((lst[0],lst[1]))
-		# (src, dest)
+def fan_out(group):
+	'''
+	Give every bacterium of a group the outputs of the first one (the
+	representative), whose network is identical. Files are copied, not
+	hard-linked: a later run in the same work_direct writes most outputs
+	in place (savefig, text files, kegg_louvain.sh), which would go
+	through a shared link into the files of another bacterium.
+
+	group : list of strings
+		names of the bacteria, see shared_table_functions.group_networks
+	'''
+	lst_rep = output_files(group[0])
+	for bact in group[1:]:
+		for fn_rep, fn in zip(lst_rep, output_files(bact)):
+			if not os.path.exists(work_direct + fn_rep):
+				continue
+			if os.path.exists(work_direct + fn):
+				os.remove(work_direct + fn)
+			shutil.copyfile(work_direct + fn_rep, work_direct + fn)
 
-	G.add_edges_from(edges_lst)
-	#print(nx.info(G))
+	return None
 
-	fp_pair_orig = open(work_direct + fn, 'r')
-	fp_pair_new = open(work_direct + fn + '_renum', 'r')
 
-	label_dict = _match_labels(fp_pair_orig = fp_pair_orig, fp_pair_new = fp_pair_new)
+def create_graph(bact, src=None, dest=None, partition_orig=None):
+	'''
+	Draw the network and its communities, and remove the isolated
+	communities.
 
-	filename_partition = 'partition_' + bact + '.txt'
+	bact : string
+		name of the bacterium.
+	src, dest, partition_orig : optional
+		pairs and partition held in memory by pipeline(); read from
+		work_direct if not given.
 
-	file = open(work_direct + filename_partition, 'r')
-	data_partition = file.read()
-	lst_partition = data_partition.split('\n')
-	if lst_partition[len(lst_partition)-1] == '':
-		lst_partition = lst_partition[:len(lst_partition)-1]
+	Returns None, or [src_after, dest_after] (lists) if the pairs are given.
+	'''
+	info('create_graph')
+	G = nx.DiGraph()
+	in_memory = src is not None
+	if not in_memory:
+		[src, dest] = _read_edges(bact, '')
+
+	if not len(src):
+		# if there are no pairs
+		if in_memory:
+			return [[], []]
+		_write_edges(bact, '_after', [], [])
+		return None
 
-	partition_new = {}
-	for row in lst_partition:
-		lst = row.split(' ')
-		partition_new[lst[0]]=int(lst[1])
-		# lst[0] is a string
-	partition_orig = {}
-	for key, value in partition_new.items():
-		partition_orig[label_dict[key]]=value
+	edges_lst = zip(np.asarray(src).tolist(), np.asarray(dest).tolist())
+	# (src, dest)
+
+	G.add_edges_from(edges_lst)
+	#print(nx.info(G))
+
+	if partition_orig is None:
+		partition_orig = _read_partition(bact, '')
 
 	size = float(len(set(partition_orig.values()))) # number of communities
 	[pos, pos_hyper, hypergraph] = community_layout(G, partition_orig)
@@ -222,14 +347,26 @@ def create_graph(bact):
 			nodes_removed.append(key)
 
 	G.remove_nodes_from(nodes_removed)
-	filename_edges_after = bact + '_pairs_full_directed_after.txt' 
-	with open(work_direct + filename_edges_after,'w') as fp:
-		fp.write('\n'.join('{}\t{}'.format(x[0],x[1]) for x in G.edges()))
+	edges_after = list(G.edges())
+	src_after = [x[0] for x in edges_after]
+	dest_after = [x[1] for x in edges_after]
+	if in_memory:
+		return [src_after, dest_after]
+	_write_edges(bact, '_after', src_after, dest_after)
 
 
 	return None
 
-def create_graph_after(bact):
+def create_graph_after(bact, src=None, dest=None, partition_orig=None):
+	'''
+	Draw the network after isolated communities are removed.
+
+	bact : string
+		name of the bacterium.
+	src, dest, partition_orig : optional
+		pairs and partition held in memory by pipeline(); read from
+		work_direct if not given.
+	'''
 	info('create_graph (after)')
 	rgb_tuple = [(0,0,0),(1,0,103),(213,255,0),(255,0,86),(158,0,142),(14,76,161),(255,229,2),(0,95,57),
 (0,255,0),(149,0,58),(255,147,126),(164,36,0),(0,21,68),(145,208,203),(98,14,0),(107,104,130),
@@ -243,49 +380,21 @@ def create_graph_after(bact):
 	strcolor=['#%02x%02x%02x' % x for x in rgb_tuple]
 
 	G = nx.DiGraph()
-	fn = bact + '_pairs_full_directed_after.txt'
-	file = open(work_direct + fn, 'r')
-	data_edges = file.read()
-	data_lst=data_edges.split('\n')
-	if data_lst[len(data_lst)-1] == '':
-		data_lst = data_lst[:len(data_lst)-1]
-		# remove the empty line at the end if needed
+	if src is None:
+		[src, dest] = _read_edges(bact, '_after')
 
-	if not data_lst: 
-		# if data_lst is empty
+	if not len(src):
+		# if there are no pairs
 		return None
 
-	edges_lst = []
-	for row in data_lst:
-		lst = row.split('\t')
-		edges_lst.append((lst[0],lst[1]))
-		# (src, dest)
+	edges_lst = zip(np.asarray(src).tolist(), np.asarray(dest).tolist())
+	# (src, dest)
 
 	G.add_edges_from(edges_lst)
 	#print(nx.info(G))
 
-	fp_pair_orig = open(work_direct + fn, 'r')
-	fp_pair_new = open(work_direct + fn + '_renum', 'r')
-
-	label_dict = _match_labels(fp_pair_orig = fp_pair_orig, fp_pair_new = fp_pair_new)
-
-	filename_partition = 'partition_' + bact + '_after.txt'
-
-	file = open(work_direct + filename_partition, 'r')
-	data_partition = file.read()
-	lst_partition = data_partition.split('\n')
-	if lst_partition[len(lst_partition)-1] == '':
-		lst_partition = lst_partition[:len(lst_partition)-1]
-
-	partition_new = {}
-	for row in lst_partition:
-		lst = row.split(' ')
-		partition_new[lst[0]]=int(lst[1])
-		# lst[0] is a string
-	partition_orig = {}
-	for key, value in partition_new.items():
-		partition_orig[label_dict[key]]=value
-
+	if partition_orig is None:
+		partition_orig = _read_partition(bact, '_after')
 
 	size = float(len(set(partition_orig.values()))) # number of communities
 	[pos, pos_hyper, hypergraph] = community_layout(G, partition_orig)
@@ -303,4 +412,54 @@ def create_graph_after(bact):
 	plt.savefig(work_direct + 'final_graph_' + bact + '_after.png', format='png', bbox_inches="tight", dpi=300)
 	plt.clf()
 
-	return None
\ No newline at end of file
+	return None
+
+
+def pipeline(bact):
+	'''
+	All stages of multi.py for one bacterium in one task: pairs, directed
+	Louvain, graph and removal of isolates, directed Louvain and graph
+	after. Everything stays in memory; only the final outputs are written
+	(the container <bact>.net and the .png graphs). Needs the tables
+	attached by shared_table_functions.attach and the native Louvain
+	engine.
+
+	bact : string
+		name of the bacterium.
+
+	Returns
+	-------
+	bact : string
+	'''
+	info('pipeline')
+	edges = np.concatenate([stf.network(bact), stf.bact_sp_pairs(bact)])
+	src = edges[:, 0]
+	dest = edges[:, 1]
+	arrays = {'src': src, 'dest': dest, 'compound': stf.compound_ids(np.unique(edges))}
+	# dense compound IDs throughout, KEGG numbers of the nodes saved once
+	for suffix in ('', '_after'):
+		arrays['nodes' + suffix] = np.zeros(0, dtype=np.int32)
+		arrays['partition' + suffix] = np.zeros(0, dtype=np.int32)
+	# without pairs, empty partitions as _louvain_native writes them
+
+	if not len(src):
+		print 'This bacterium has empty pairs: ' + bact
+		src_after = []
+		dest_after = []
+	else:
+		[nodes, partition, q] = lvf.louvain(src, dest)
+		arrays['nodes'] = nodes.astype(np.int32)
+		arrays['partition'] = partition
+		[src_after, dest_after] = create_graph(bact, src.tolist(), dest.tolist(), dict(zip(nodes.tolist(), partition.tolist())))
+
+	arrays['src_after'] = np.array(src_after, dtype=np.int32)
+	arrays['dest_after'] = np.array(dest_after, dtype=np.int32)
+	if len(src_after):
+		[nodes, partition, q] = lvf.louvain(src_after, dest_after)
+		arrays['nodes_after'] = nodes.astype(np.int32)
+		arrays['partition_after'] = partition
+		create_graph_after(bact, src_after, dest_after, dict(zip(nodes.tolist(), partition.tolist())))
+
+	off.write(work_direct + bact + '.net', arrays)
+
+	return bact
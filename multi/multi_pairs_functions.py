@@ -138,4 +138,110 @@ def append_pairs_sp(reac_lst, ws, pairs_lst):
 					if tp not in pairs_lst:
 						pairs_lst.append(tp)
 	
-	return pairs_lst
\ No newline at end of file
+	return pairs_lst
+
+def obtain_pairs_table(ba_reac_lst, table):
+	'''
+	Same as obtain_pairs: one lookup per reaction in a prebuilt table and
+	an ordered set union of the pairs.
+
+	Parameters
+	----------
+	ba_reac_lst : list of strings
+		list of reactions that this bacterium encodes
+	table : reaction_db_functions.ReactionPairTable
+		Pairs of the bioreaction database 'Reactions' tab
+
+	Returns
+	-------
+	pairs_lst : list of tuples - [(int, int), (int, int),...]
+		List of reactant pairs from enzymatic reactions for a certain
+		bacterium. The edges are *directed*.
+	'''
+	pairs_lst = []
+	pairs_set = set()
+	for reac in ba_reac_lst:
+		for pair in table.get(reac):
+			if pair not in pairs_set:
+				pairs_set.add(pair)
+				pairs_lst.append(pair)
+
+	return pairs_lst
+
+
+def append_pairs_sp_index(index, pairs_lst):
+	'''
+	Same as append_pairs_sp: only the non-enzymatic reactions that share
+	a compound with pairs_lst are found through the inverted index and
+	visited, in the order of the sheet.
+
+	Parameters
+	----------
+	index : reaction_db_functions.CompoundIndex
+		Index of the bioreaction database 'Non-enzymatic reactions' tab
+	pairs_lst : list of tuples - [(int, int), (int, int),...]
+		List of reactant pairs from enzymatic reactions for a certain
+		bacterium. The edges are *directed*.
+
+	Returns
+	-------
+	pairs_lst : list of tuples - [(int, int), (int, int),...]
+		The updated list of reactant pairs (directed) from both non-enzymatic reactions
+		and enzymatic reactions for this bacterium.
+	'''
+	set_nodes = set(x for y in pairs_lst for x in y)
+	pairs_set = set(pairs_lst)
+
+	for idx in index.rows_of(set_nodes):
+		for tp in index.pairs[idx]:
+			if tp not in pairs_set:
+				pairs_set.add(tp)
+				pairs_lst.append(tp)
+
+	return pairs_lst
+
+
+def close_pairs_sp(index, pairs_lst, fixed_point=False):
+	'''
+	Append the pairs of the non-enzymatic reactions that share a compound
+	with pairs_lst, as append_pairs_sp_index. With fixed_point=True the
+	compounds brought in by these reactions are put on a worklist and
+	the rule is applied again to the reactions they touch, until no new
+	compound appears.
+
+	Parameters
+	----------
+	index : reaction_db_functions.CompoundIndex
+		Index of the bioreaction database 'Non-enzymatic reactions' tab
+	pairs_lst : list of tuples - [(int, int), (int, int),...]
+		Reactant pairs (directed) of all enzymatic reactions of an organism
+	fixed_point : bool
+
+	Returns
+	-------
+	pairs_lst : list of tuples - [(int, int), (int, int),...]
+		The updated list. Pairs added in one round follow the order of
+		the sheet.
+	'''
+	set_nodes = set(x for y in pairs_lst for x in y)
+	pairs_set = set(pairs_lst)
+	rows_done = set()
+	worklist = set_nodes
+
+	while worklist:
+		rows = [idx for idx in index.rows_of(worklist) if idx not in rows_done]
+		rows_done.update(rows)
+		worklist = set()
+		for idx in rows:
+			for tp in index.pairs[idx]:
+				if tp not in pairs_set:
+					pairs_set.add(tp)
+					pairs_lst.append(tp)
+				for node in tp:
+					if node not in set_nodes:
+						set_nodes.add(node)
+						worklist.add(node)
+		if not fixed_point:
+			break
+
+	return pairs_lst
@@ -1,14 +1,21 @@
 import multi_utils as mu
+import os
 import pickle
 
-update_database = raw_input('>>> Do you want to update the local KEGG database? (y or n):\n')
+update_database = raw_input('>>> Do you want to update the local KEGG database? (y, n, i for an incremental update, or o to rebuild offline from the response cache):\n')
 if update_database == 'y':
 	mu.request_api()
+elif update_database == 'i':
+	previous = raw_input('>>> Date of the previous snapshot (e.g. 2017-11-10):\n')
+	mu.request_api(previous=previous)
+elif update_database == 'o':
+	mu.request_api(offline=True)
 
 filename_ec_bact = raw_input('>>> Name of the ec_bact file:\n')
 filename_ec_reac = raw_input('>>> Name of the ec_reac file:\n')
 filename_db = raw_input('>>> Name of the bioreaction database:\n')
-[lst_bact, dict_bact_ec, dict_ec_pairs] = mu.obtain_dict(filename_ec_bact=filename_ec_bact, filename_ec_reac=filename_ec_reac, filename_db=filename_db)
+sp_level = raw_input('>>> Add non-enzymatic reactions per enzyme (e), per organism (o), or per organism until no new compound appears (c)?\n')
+[lst_bact, dict_bact_ec, dict_ec_pairs] = mu.obtain_dict(filename_ec_bact=filename_ec_bact, filename_ec_reac=filename_ec_reac, filename_db=filename_db, sp_per_ec=sp_level not in ('o', 'c'))
 
 afile = open(r'lst_bact.pkl', 'wb')
 pickle.dump(lst_bact, afile)
@@ -20,4 +27,13 @@ bfile.close()
 
 cfile = open(r'dict_ec_pairs.pkl', 'wb')
 pickle.dump(dict_ec_pairs, cfile)
-cfile.close()
\ No newline at end of file
+cfile.close()
+
+if sp_level in ('o', 'c'):
+	dict_bact_sp = mu.obtain_bact_sp(lst_bact, dict_bact_ec, dict_ec_pairs, filename_db=filename_db, fixed_point=sp_level == 'c')
+	dfile = open(r'dict_bact_sp.pkl', 'wb')
+	pickle.dump(dict_bact_sp, dfile)
+	dfile.close()
+elif os.path.exists('dict_bact_sp.pkl'):
+	os.remove('dict_bact_sp.pkl')
+	# multi.py adds the pairs of this file; they are already in dict_ec_pairs
@@ -1,14 +1,27 @@
-import requests
 from request_api_functions import *
+import fetch_functions as ff
+import flatfile_functions as flf
+import cache_functions as cf
+import journal_functions as jf
+import update_functions as uf
+import link_functions as lf
+import ec_matrix_functions as emf
+import reaction_db_functions as rdf
+import sqlite_functions as sf
 import multi_pairs_functions as mpf
+import dict_cache_functions as dcf
+import snapshot_store_functions as ssf
 import datetime
 import os
+from array import array
 
 from openpyxl import load_workbook
 import construct_network_functions as cnf
 
 
 database_direct = 'your-KEGG-database-directory' # e.g. KEGG/database/
+cache_direct = None # e.g. KEGG/cache/ ; set to keep raw KEGG responses on disk
+store_direct = None # e.g. KEGG/store/ ; set to add every snapshot to a deduplicated store
 
 def info(title):
     print(title)
@@ -19,17 +32,57 @@ def info(title):
     return None
 
 
-def request_api():
+def request_api(n_threads=8, rate_limit=3., base_url=ff.kegg_rest, batch_size=10, offline=False, previous=None, source='genes', filename_db='bioreaction_database.xlsx', table_format='xlsx'):
+	'''
+	Download the KEGG organism list, enzyme list and every enzyme entry,
+	and save them to dated table files in database_direct.
+
+	Parameters
+	----------
+	n_threads : int
+		Number of concurrent requests for enzyme entries
+	rate_limit : float or None
+		Maximum number of requests started per second
+	base_url : string
+		Root of the KEGG REST API. End this string with '/'
+	batch_size : int
+		Number of enzyme entries per request (at most 10). 1 fetches one by one.
+	offline : bool
+		Build the database only from the response cache in cache_direct,
+		without any network access.
+	previous : string or None
+		Date of a previous snapshot in database_direct, e.g. '2017-11-10'.
+		If given, only new or changed ECs are downloaded and the rest is
+		carried over from that snapshot (see update_functions).
+	source : string
+		'genes' - parse the GENES and ALL_REAC sections of every enzyme entry
+		'link' - use the link/ec/<org> and link/reaction/enzyme endpoints
+		instead (see link_functions). This downloads far less.
+	filename_db : string or None
+		Bioreaction database in database_direct whose reactant pairs are
+		added to the SQLite copy of the database (see sqlite_functions).
+	table_format : string
+		Format of the dated tables: 'xlsx', 'csv', 'tsv' or 'npz'
+		(see request_api_functions.TableSink).
+	'''
 	info('request api')
+	if table_format not in table_formats:
+		raise ValueError('Unknown table format: ' + table_format)
+	ext = '.' + table_format
 
-	r = requests.get('http://rest.kegg.jp/list/organism')
-	txt_org = r.text.encode('ascii','ignore')
+	cache = None
+	if cache_direct is not None:
+		cache = cf.ResponseCache(cache_direct, offline=offline)
+	elif offline:
+		raise ValueError('Offline mode needs a response cache: set cache_direct.')
+
+	txt_org = ff.get_text('list/organism', base_url=base_url, cache=cache).encode('ascii','ignore')
 
 	lst_org = []
 	for line in txt_org.splitlines():
 		lst_org.append(dict(zip(('Code','Abbr','Name','Type'),line.split('\t')))) 
 
-	filename_org = 'KEGG_organism_' + str(datetime.date.today()) + '.xlsx'
+	filename_org = 'KEGG_organism_' + str(datetime.date.today()) + ext
 	savexls_org(dir=database_direct, filename=filename_org, lst_org=lst_org)
 
 	lst_bact = []
@@ -37,7 +90,7 @@ def request_api():
 		if 'Bacteria' in org['Type']:
 			lst_bact.append(org)
 
-	filename_bact = 'KEGG_bacteria_' + str(datetime.date.today()) + '.xlsx'
+	filename_bact = 'KEGG_bacteria_' + str(datetime.date.today()) + ext
 	savexls_bact(dir=database_direct, filename=filename_bact, lst_bact=lst_bact)
 
 	print(">>> Creating list of abbrieviations...")
@@ -46,75 +99,82 @@ def request_api():
 		abbr_of_bacteria.append(bact['Abbr'].upper())
 
 	print('>>> Requesting enzyme list...')
-	r = requests.get('http://rest.kegg.jp/list/enzyme')
-	txt_enzyme = r.text.encode('ascii','ignore') 
+	txt_enzyme = ff.get_text('list/enzyme', base_url=base_url, cache=cache).encode('ascii','ignore') 
 
 	lst_enzyme = []
 	for line in txt_enzyme.splitlines():
 		lst_enzyme.append(dict(zip(('Code','Name'),line.split('\t'))))
 		# this list may include deleted/transferred enzyme entries.
 
+	filename_enzyme = 'KEGG_enzyme_' + str(datetime.date.today()) + ext
+	savexls_enzyme(dir=database_direct, filename=filename_enzyme, lst_enzyme=lst_enzyme)
+
 	print('>>> Creating list of EC numbers...')
 	lst_ec = []
 	for enzyme in lst_enzyme:
 		lst_ec.append(enzyme['Code'].replace("ec:", ""))
 		# this list may include deleted/transferred enzyme entries.
 
-	'''For a specific EC number (e.g. 1.1.1.1), we use keyword "GENES" and "DBLINKS" to get the "Genes" entry of this enzyme, 
-which contains information of abbrieviation of bacteria that encode this enzyme. We assume that
-enzymes without GENES or DBLINKS entries are deleted ec entries. '''
-	print('>>> Establishing EC - bacteria relations...')
-	lst_ec_bact = [] 
-	# a list of dictionaries that record EC number and which bacteria encode this enzyme
-
-	i = 0
-	for ec in lst_ec:
-		address='http://rest.kegg.jp/get/'+ec
-		r = requests.get(address)
-		if 'GENES' in r.text:
-			tmp_text1=r.text.split("GENES")[1]
-			if 'DBLINKS' in tmp_text1:
-				tmp_text2=tmp_text1.split("DBLINKS")[0] 
-				lst_ec_bact.append({"EC":ec})
-				for bact in abbr_of_bacteria:
-					if bact in tmp_text2:
-						lst_ec_bact[i][bact]='1'
-					else:
-						lst_ec_bact[i][bact]='0'
-				i = i + 1
-
-	filename_ec_bact = 'KEGG_EC_bact_' + str(datetime.date.today()) + '.xlsx'
-	savexls_ec_bact(dir=database_direct, filename=filename_ec_bact, lst_ec_bact=lst_ec_bact, lst_abbr=abbr_of_bacteria)
-
-	'''For a specific EC number (e.g. 1.1.1.1), we use keyword "ALL_REAC" and "SUBSTRATE" to get 
-the "ALL_REAC" entry of this enzyme, which contains information of reactions this enzyme
-catalyzes. We assume that enzymes without ALL_REAC or SUBSTRATE entries are deleted ec entries. '''
-	print('>>> Establishing EC - reaction relations...')
-	lst_ec_reac = [] 
-	# a list of dictionaries that record EC number and what reactions this enzyme catalyzes.
-
-	for ec in lst_ec:
-		address='http://rest.kegg.jp/get/'+ec
-		r = requests.get(address)
-		if 'ALL_REAC' in r.text:
-			tmp_text1=r.text.split('ALL_REAC')[1]
-			if 'SUBSTRATE' in tmp_text1:
-				tmp_text2=tmp_text1.split('SUBSTRATE')[0] 
-				tmp_text2 = tmp_text2.encode('ascii','ignore')
-				lst_reac=tmp_text2.split()
-				lst_reac=[x for x in lst_reac if x.startswith('R')]
-				lst_reac=[x.replace(';', '') for x in lst_reac]
-				lst_ec_reac.append({"EC":ec, "Reactions":lst_reac})
-
-	filename_ec_reac = 'KEGG_EC_reac_' + str(datetime.date.today()) + '.xlsx'
+	print('>>> Establishing EC - bacteria and EC - reaction relations...')
+	mode = 'full' if previous is None or source == 'link' else 'incremental ' + previous
+	journal = jf.DownloadJournal(database_direct + 'KEGG_download_journal.txt', abbr_of_bacteria,
+		date=str(datetime.date.today()), source=source, mode=mode)
+	# parsed entries are committed to the journal as they arrive, so an
+	# interrupted download resumes from where it stopped.
+	lst_ec_todo = lst_ec
+
+	if source == 'link':
+		lf.link_journal(journal=journal, lst_ec=lst_ec, abbr_of_bacteria=abbr_of_bacteria, n_threads=n_threads, rate_limit=rate_limit, base_url=base_url, cache=cache)
+		lst_ec_todo = []
+	elif previous is not None:
+		snapshot = uf.read_snapshot(dir=database_direct, date=previous)
+		[lst_ec_todo, lst_abbr_new] = uf.plan_update(snapshot=snapshot, lst_enzyme=lst_enzyme, abbr_of_bacteria=abbr_of_bacteria)
+		print('>>> Incremental update: ' + str(len(lst_ec_todo)) + ' ECs to fetch, ' + str(len(lst_abbr_new)) + ' new bacteria')
+		dict_new_bact_ec = lf.link_bact_ec(lst_abbr_new, n_threads=n_threads, rate_limit=rate_limit, base_url=base_url, cache=cache)
+		uf.merge_snapshot(journal=journal, snapshot=snapshot, lst_ec=lst_ec, lst_ec_fetch=lst_ec_todo, abbr_of_bacteria=abbr_of_bacteria, dict_new_bact_ec=dict_new_bact_ec)
+
+	lst_ec_todo = [ec for ec in lst_ec_todo if ec not in journal.done]
+
+	set_abbr = set(abbr_of_bacteria)
+	for ec, text in ff.fetch_entries(lst_ec_todo, n_threads=n_threads, rate_limit=rate_limit, base_url=base_url, batch_size=batch_size, cache=cache):
+		# each entry is downloaded once and feeds both relations
+		record = flf.parse_entry(text)
+		journal.record_sets(ec, flf.ec_bacteria(record, set_abbr), flf.ec_reactions(record))
+
+	[matrix_ec_bact, lst_ec_reac] = journal.assemble(lst_ec)
+	# matrix_ec_bact: sparse matrix that records EC number and which bacteria encode this enzyme
+	# lst_ec_reac: a list of dictionaries that record EC number and what reactions this enzyme catalyzes.
+
+	filename_ec_bact = 'KEGG_EC_bact_' + str(datetime.date.today()) + ext
+	savexls_ec_bact(dir=database_direct, filename=filename_ec_bact, matrix=matrix_ec_bact)
+	if table_format != 'npz':
+		matrix_ec_bact.save(database_direct + 'KEGG_EC_bact_' + str(datetime.date.today()) + '.npz')
+		# compact copy, read by obtain_dict instead of the table file when present
+
+	filename_ec_reac = 'KEGG_EC_reac_' + str(datetime.date.today()) + ext
 	savexls_ec_reac(dir=database_direct, filename=filename_ec_reac, lst_ec_reac=lst_ec_reac)
 
+	conn = sf.connect(database_direct + 'KEGG_' + str(datetime.date.today()) + '.sqlite')
+	sf.load_request(conn, lst_org=lst_org, lst_enzyme=lst_enzyme, matrix_ec_bact=matrix_ec_bact, lst_ec_reac=lst_ec_reac)
+	if filename_db is not None and os.path.exists(database_direct + filename_db):
+		[db_en, db_sp] = rdf.obtain_db(database_direct + filename_db)
+		sf.load_reaction_db(conn, db_en, db_sp)
+	conn.close()
+
+	journal.close(remove=True)
+
+	if store_direct is not None:
+		n_new = ssf.commit(store_dir=store_direct, dir=database_direct, date=str(datetime.date.today()))
+		print('>>> ' + str(n_new) + ' new chunks in the snapshot store')
+
 	return None
 
 
-def obtain_dict(filename_ec_bact, filename_ec_reac, filename_db):
-	
-	print('>>> Reading EC-bacteria relations:\n')
+def _read_ec_bact(filename_ec_bact):
+	'''
+	Read the EC - bacteria relations from the .xlsx file.
+	Returns [lst_bact, dict_bact_ec].
+	'''
 	wb_ec_bact = load_workbook(filename = database_direct + filename_ec_bact)
 	ws_ec_bact = wb_ec_bact['Sheet 1']
 	lst_row1 = ws_ec_bact[1]
@@ -139,35 +199,159 @@ def obtain_dict(filename_ec_bact, filename_ec_reac, filename_db):
 			idx = idx + 1
 		dict_bact_ec[ba_name]=ba_ec_lst
 
+	return [lst_bact, dict_bact_ec]
+
+
+def _stream_ec_bact(filename_ec_bact):
+	'''
+	Read the EC - bacteria relations row by row (read-only, values only)
+	and transpose them in the same pass: each bacterium collects the row
+	numbers of its ECs in an int array. Only EC and bacteria names are
+	encoded. Returns [lst_bact, dict_bact_ec].
+	'''
+	rows = read_table(database_direct + filename_ec_bact, encode=False)
+	lst_bact = [x.encode('ascii','ignore') for x in next(rows)[1:]]
+	lst_ec = []
+	lst_idx = [array('i') for x in lst_bact]
+	# lst_idx[j]: row numbers of the ECs of bacterium j
+
+	for row in rows:
+		if not row or not row[0]:
+			continue
+		i = len(lst_ec)
+		lst_ec.append(row[0].encode('ascii','ignore'))
+		for j, flag in enumerate(row[1:]):
+			if flag == '1':
+				lst_idx[j].append(i)
 
-	wb_ec_reac = load_workbook(filename = database_direct + filename_ec_reac)
-	ws_ec_reac = wb_ec_reac['Sheet 1']
+	dict_bact_ec = {}
+	for j in range(0, len(lst_bact)):
+		dict_bact_ec[lst_bact[j]] = [lst_ec[i] for i in lst_idx[j]]
+
+	return [lst_bact, dict_bact_ec]
+
+
+def obtain_dict(filename_ec_bact, filename_ec_reac, filename_db, stream=True, cache=True, sp_per_ec=True):
+	'''
+	Build the python dictionaries used by multi.py from the database files.
+
+	Parameters
+	----------
+	filename_ec_bact, filename_ec_reac : string
+		EC - bacteria and EC - reaction tables in database_direct
+	filename_db : string
+		Bioreaction database in database_direct
+	stream : bool
+		Read the tables row by row in read-only mode (any format of
+		request_api_functions.TableSink). False uses the old full-workbook
+		reader for the EC - bacteria table.
+	cache : bool
+		Keep the result in database_direct as KEGG_dict_<key>.npz, keyed
+		by the contents of the three input files (see dict_cache_functions),
+		and return it from there when the inputs are unchanged.
+	sp_per_ec : bool
+		Add the non-enzymatic reactions to the pairs of every EC. False
+		keeps only the enzymatic pairs; add them per organism instead
+		with obtain_bact_sp.
+
+	Returns
+	-------
+	[lst_bact, dict_bact_ec, dict_ec_pairs]
+	'''
+	filename_matrix = database_direct + os.path.splitext(filename_ec_bact)[0] + '.npz'
+	if not cache:
+		return _build_dict(filename_ec_bact, filename_ec_reac, filename_db, filename_matrix, stream, sp_per_ec)
+
+	lst_input = [filename_matrix if os.path.exists(filename_matrix) else database_direct + filename_ec_bact,
+		database_direct + filename_ec_reac, database_direct + filename_db]
+	filename_cache = database_direct + 'KEGG_dict_' + dcf.cache_key(lst_input, options='sp_per_ec=' + str(sp_per_ec)) + '.npz'
+	if os.path.exists(filename_cache):
+		print('>>> Inputs unchanged, reading cached dictionaries... File name: ' + filename_cache)
+		return dcf.load(filename_cache)
+
+	[lst_bact, dict_bact_ec, dict_ec_pairs] = _build_dict(filename_ec_bact, filename_ec_reac, filename_db, filename_matrix, stream, sp_per_ec)
+	dcf.save(filename_cache, lst_bact, dict_bact_ec, dict_ec_pairs)
+	dcf.prune(database_direct)
+	# entries of earlier database refreshes are dropped
 
-	wb_db = load_workbook(filename = database_direct + filename_db)
-	ws_db = wb_db['Reactions']
-	ws_sp = wb_db['Non-enzymatic reactions']
+	return [lst_bact, dict_bact_ec, dict_ec_pairs]
 
-	reac_column_a = ws_db['A']
-	lst_reac = []
-	for item in reac_column_a:
-		if item.value == None:
-			lst_reac.append('X')
-		else:
-			lst_reac.append((item.value).encode('ascii','ignore'))
 
-	reac_col_sp = ws_sp['A']
-	lst_reac_sp = [(x.value).encode('ascii','ignore') for x in reac_col_sp if x.value]
-	lst_reac_sp = lst_reac_sp[2:]
+def _build_dict(filename_ec_bact, filename_ec_reac, filename_db, filename_matrix, stream, sp_per_ec):
+	print('>>> Reading EC-bacteria relations:\n')
+	if os.path.exists(filename_matrix):
+		matrix_ec_bact = emf.ECBactMatrix.load(filename_matrix)
+		lst_bact = matrix_ec_bact.bact.tolist()
+		dict_bact_ec = matrix_ec_bact.dict_bact_ec()
+	elif stream:
+		[lst_bact, dict_bact_ec] = _stream_ec_bact(filename_ec_bact)
+	else:
+		[lst_bact, dict_bact_ec] = _read_ec_bact(filename_ec_bact)
+
+	rows_ec_reac = read_table(database_direct + filename_ec_reac)
+	next(rows_ec_reac)
+
+	[db_en, db_sp] = rdf.obtain_db(database_direct + filename_db)
+	# column arrays of the 'Reactions' and 'Non-enzymatic reactions' sheets,
+	# converted from the .xlsx file once and kept next to it as .npz
+	table_en = rdf.ReactionPairTable(db_en)
+	index_sp = rdf.CompoundIndex(db_sp)
 
 	dict_ec_pairs = {}
-	for row in ws_ec_reac.iter_rows(min_row = 2):
-		row_values=[(x.value).encode('ascii','ignore') for x in row if x.value]
+	for row in rows_ec_reac:
+		row_values = [x for x in row if x]
+		if not row_values:
+			continue
 		ec_name = row_values[0]
 		print 'The enzyme being studied is: ' + ec_name
 		ec_reac_lst = row_values[1:]
-		pairs_lst = mpf.obtain_pairs(ba_reac_lst=ec_reac_lst, reac_lst=lst_reac, ws = ws_db)
-		pairs_lst_full = mpf.append_pairs_sp(reac_lst=lst_reac_sp, ws = ws_sp, pairs_lst = pairs_lst)
-		dict_ec_pairs[ec_name]=pairs_lst_full
+		pairs_lst = mpf.obtain_pairs_table(ba_reac_lst=ec_reac_lst, table=table_en)
+		if sp_per_ec:
+			pairs_lst = mpf.append_pairs_sp_index(index=index_sp, pairs_lst=pairs_lst)
+		dict_ec_pairs[ec_name]=pairs_lst
 
 	return [lst_bact, dict_bact_ec, dict_ec_pairs]
 
+
+def obtain_bact_sp(lst_bact, dict_bact_ec, dict_ec_pairs, filename_db, fixed_point=False):
+	'''
+	Apply the non-enzymatic reaction rule (see
+	multi_pairs_functions.append_pairs_sp) once per organism, to the
+	compounds of all its enzymatic reactions together.
+
+	Parameters
+	----------
+	lst_bact, dict_bact_ec, dict_ec_pairs
+		Output of obtain_dict(sp_per_ec=False)
+	filename_db : string
+		Bioreaction database in database_direct
+	fixed_point : bool
+		Repeat the rule with the compounds of the added reactions until
+		nothing changes (see multi_pairs_functions.close_pairs_sp).
+
+	Returns
+	-------
+	dict_bact_sp : dict
+		key - bacteria names (string)
+		value - reactant pairs of non-enzymatic reactions that are not
+		already enzymatic pairs of this bacterium (list of tuples)
+	'''
+	print('>>> Adding non-enzymatic reactions per organism...')
+	[db_en, db_sp] = rdf.obtain_db(database_direct + filename_db)
+	index_sp = rdf.CompoundIndex(db_sp)
+
+	dict_bact_sp = {}
+	for bact in lst_bact:
+		pairs_lst = []
+		pairs_set = set()
+		for ec in dict_bact_ec[bact]:
+			for pair in dict_ec_pairs.get(ec, ()):
+				if pair not in pairs_set:
+					pairs_set.add(pair)
+					pairs_lst.append(pair)
+		n_en = len(pairs_lst)
+		pairs_lst = mpf.close_pairs_sp(index=index_sp, pairs_lst=pairs_lst, fixed_point=fixed_point)
+		dict_bact_sp[bact] = pairs_lst[n_en:]
+
+	return dict_bact_sp
+
@@ -0,0 +1,105 @@
+'''
+
+network_batch_functions
+~~~~~~~~~~~~~
+
+Contains a batch builder of the reactant pair lists of all organisms.
+
+The organism x EC relation (A) and the EC x pair incidence (B) are
+sparse matrices. One sparse product, A.B, gives the organism x pair
+membership of every organism at once; the pairs of organism j are the
+column indices of row j. Pair columns are numbered in the order the
+pairs first appear in dict_ec_pairs (ECs sorted), so every organism's
+pairs come out in this one canonical order.
+
+python 2.7.5
+
+'''
+import numpy as np
+import scipy.sparse as sp
+
+
+def incidence(dict_ec_pairs):
+	'''
+	EC x pair incidence matrix.
+
+	Parameters
+	----------
+	dict_ec_pairs : dict
+		key - enzymes (string)
+		value - list of reactant pairs (list of tuples)
+
+	Returns
+	-------
+	lst_ec : list of strings
+		EC numbers, one per row (sorted)
+	pairs : numpy array of int32, shape (n, 2)
+		Distinct reactant pairs, one per column
+	matrix : scipy.sparse.csr_matrix of int32, shape (len(lst_ec), n)
+	'''
+	lst_ec = sorted(dict_ec_pairs)
+	col_of = {}
+	indptr = [0]
+	indices = []
+	for ec in lst_ec:
+		row = set()
+		for pair in dict_ec_pairs[ec]:
+			if pair not in col_of:
+				col_of[pair] = len(col_of)
+			row.add(col_of[pair])
+		indices.extend(sorted(row))
+		indptr.append(len(indices))
+	pairs = np.zeros((len(col_of), 2), dtype=np.int32)
+	for pair, col in col_of.items():
+		pairs[col] = pair
+	matrix = sp.csr_matrix((np.ones(len(indices), dtype=np.int32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+		shape=(len(lst_ec), len(col_of)))
+	return [lst_ec, pairs, matrix]
+
+
+def organism_ec(lst_bact, dict_bact_ec, lst_ec):
+	'''
+	Organism x EC matrix (scipy.sparse.csr_matrix of int32). ECs that
+	are not in lst_ec (no reactant pairs) are left out.
+	'''
+	row_of = dict((ec, i) for i, ec in enumerate(lst_ec))
+	indptr = [0]
+	indices = []
+	for bact in lst_bact:
+		indices.extend(sorted(set(row_of[ec] for ec in dict_bact_ec.get(bact, []) if ec in row_of)))
+		indptr.append(len(indices))
+	return sp.csr_matrix((np.ones(len(indices), dtype=np.int32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+		shape=(len(lst_bact), len(lst_ec)))
+
+
+def batch_pairs(lst_bact, dict_bact_ec, dict_ec_pairs):
+	'''
+	Reactant pairs of every organism, from one sparse product.
+
+	Parameters
+	----------
+	lst_bact : list of strings
+		Names of the bacteria
+	dict_bact_ec : dict
+		key - bacteria names (string)
+		value - list of enzymes (list of strings)
+	dict_ec_pairs : dict
+		key - enzymes (string)
+		value - list of reactant pairs (list of tuples)
+
+	Returns
+	-------
+	indptr : numpy array of int64, length len(lst_bact) + 1
+	edges : numpy array of int32, shape (n, 2)
+		Pairs of bacterium j: edges[indptr[j]:indptr[j+1]], every pair of
+		its ECs once, in canonical order.
+	'''
+	print('>>> Building the reactant pairs of all organisms...')
+	[lst_ec, pairs, matrix_ec_pair] = incidence(dict_ec_pairs)
+	matrix_bact_ec = organism_ec(lst_bact, dict_bact_ec, lst_ec)
+	membership = matrix_bact_ec.dot(matrix_ec_pair).tocsr()
+	# entry (j, k): number of ECs of bacterium j that have pair k
+	membership.sort_indices()
+	indptr = membership.indptr.astype(np.int64)
+	edges = pairs[membership.indices]
+	return [indptr, edges]
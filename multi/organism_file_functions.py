@@ -0,0 +1,127 @@
+'''
+
+organism_file_functions
+~~~~~~~~~~~~~
+
+Contains a binary container for the per-bacterium data of multi.py
+(<bact>.net in work_direct), in place of the tab and space separated
+pairs, renumbering and partition text files.
+
+A container holds named, typed arrays:
+	src, dest                   reactant pairs (dense compound IDs, see
+	                            compound_functions), int32
+	compound                    KEGG compound numbers of the nodes, sorted
+	nodes, partition            node labels (sorted) and their communities
+	src_after, dest_after       pairs left after removing isolated communities
+	nodes_after, partition_after
+
+Dense IDs keep the order of the KEGG numbers, so compound is aligned
+with nodes: node nodes[i] is compound compound[i].
+
+Layout: the magic line 'KEGGNET1\n', the length of the header (8 bytes,
+little endian), the header (JSON: name -> dtype, shape, offset), then
+the arrays, each starting at a multiple of 64 bytes. OrganismFile maps
+the arrays read-only from disk without reading or parsing the file.
+
+python 2.7.5
+
+'''
+import json
+import os
+import struct
+
+import numpy as np
+
+
+_magic = b'KEGGNET1\n'
+_align = 64
+
+
+def write(filename, arrays):
+	'''
+	Write a container (replacing any existing file at once).
+
+	Parameters
+	----------
+	filename : string
+	arrays : dict
+		key - name (string)
+		value - numpy array
+	'''
+	arrays = dict((name, np.ascontiguousarray(arr)) for name, arr in arrays.items())
+	header = {}
+	offset = 0
+	for name in sorted(arrays):
+		arr = arrays[name]
+		header[name] = [arr.dtype.str, list(arr.shape), offset]
+		offset = offset + (arr.nbytes + _align - 1) // _align * _align
+	text = json.dumps(header, sort_keys=True).encode('ascii')
+	start = len(_magic) + 8 + len(text)
+	pad = (_align - start % _align) % _align
+	text = text + b' ' * pad
+	# the first array starts aligned
+
+	with open(filename + '.tmp', 'wb') as fp:
+		fp.write(_magic)
+		fp.write(struct.pack('<Q', len(text)))
+		fp.write(text)
+		for name in sorted(arrays):
+			data = arrays[name].tobytes()
+			fp.write(data)
+			fp.write(b'\0' * ((_align - len(data) % _align) % _align))
+	os.rename(filename + '.tmp', filename)
+	return None
+
+
+def update(filename, arrays):
+	'''
+	Add or replace arrays of a container, keeping the others. The file
+	is created if it does not exist.
+	'''
+	merged = {}
+	if os.path.exists(filename):
+		data = OrganismFile(filename)
+		for name in data.keys():
+			merged[name] = np.array(data[name])
+	merged.update(arrays)
+	return write(filename, merged)
+
+
+class OrganismFile(object):
+	'''
+	Read-only, memory-mapped view of a container.
+
+	Parameters
+	----------
+	filename : string
+	'''
+	def __init__(self, filename):
+		self.filename = filename
+		with open(filename, 'rb') as fp:
+			if fp.read(len(_magic)) != _magic:
+				raise ValueError('Not an organism file: ' + filename)
+			n = struct.unpack('<Q', fp.read(8))[0]
+			self.header = json.loads(fp.read(n).decode('ascii'))
+		self.start = len(_magic) + 8 + n
+		self.size = os.path.getsize(filename)
+
+	def keys(self):
+		return sorted(str(x) for x in self.header)
+
+	def __contains__(self, name):
+		return name in self.header
+
+	def __getitem__(self, name):
+		[dtype, shape, offset] = self.header[name]
+		dtype = np.dtype(str(dtype))
+		if int(np.prod(shape)) == 0:
+			return np.zeros(shape, dtype=dtype)
+			# np.memmap cannot map an empty array
+		if self.start + offset + int(np.prod(shape)) * dtype.itemsize > self.size:
+			raise IOError('Truncated organism file: ' + self.filename + ' (' + name + ')')
+		return np.memmap(self.filename, dtype=dtype, mode='r', offset=self.start + offset, shape=tuple(shape))
+
+	def get(self, name, default=None):
+		if name not in self.header:
+			return default
+		return self[name]
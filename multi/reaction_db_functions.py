@@ -0,0 +1,230 @@
+'''
+
+reaction_db_functions
+~~~~~~~~~~~~~
+
+Contains a one-time converter of the bioreaction database (.xlsx) to
+typed column arrays (.npz), its loader, a reaction -> reactant
+pairs lookup table and a compound -> reactions inverted index built
+from the arrays.
+
+For both the 'Reactions' and the 'Non-enzymatic reactions' sheets the
+columns kept are: reaction ID (column A), irreversibility (column C)
+and up to four (src, dest) reactant pairs (columns F - M). Compounds
+are stored as int32 numbers, e.g. C00890 -> 890, and 0 marks an empty
+pair. Glycans (e.g. G10542) are stored as glycan_offset + number.
+
+python 2.7.5
+
+'''
+import numbers
+import os
+import re
+
+import numpy as np
+from openpyxl import load_workbook
+
+
+glycan_offset = 100000
+n_pairs = 4
+sheets = {'en': 'Reactions', 'sp': 'Non-enzymatic reactions'}
+header_rows = {'en': 0, 'sp': 2}
+_reac_pattern = re.compile(r'R\d{5}$')
+
+
+def compound_id(value):
+	'''
+	Convert a cell of a reactant pair column to an int compound number.
+	Empty cells give 0.
+	'''
+	if value is None or value == '':
+		return 0
+	if isinstance(value, numbers.Number):
+		return int(value)
+	value = value.strip()
+	if value.startswith('G'):
+		return glycan_offset + int(value[1:])
+	if value.startswith('C'):
+		return int(value[1:])
+	return int(value)
+
+
+def _read_sheet(ws, n_header):
+	lst_reac = []
+	lst_irrev = []
+	lst_src = []
+	lst_dest = []
+	seen = set()
+	for idx, row in enumerate(ws.iter_rows(values_only=True)):
+		if idx < n_header or not row or not row[0]:
+			continue
+		reac = row[0].encode('ascii','ignore')
+		if not _reac_pattern.match(reac):
+			# e.g. a repeated header row
+			continue
+		if reac in seen:
+			# only the first row of a reaction is ever used
+			continue
+		seen.add(reac)
+		row = list(row) + [None] * (5 + 2*n_pairs - len(row))
+		lst_reac.append(reac)
+		lst_irrev.append(int(row[2]))
+		lst_src.append([compound_id(row[5 + 2*k]) if row[5 + 2*k] else 0 for k in range(n_pairs)])
+		lst_dest.append([compound_id(row[6 + 2*k]) if row[5 + 2*k] else 0 for k in range(n_pairs)])
+	return {'reac': np.array(lst_reac, dtype=str),
+		'irrev': np.array(lst_irrev, dtype=np.int8),
+		'src': np.array(lst_src, dtype=np.int32).reshape(-1, n_pairs),
+		'dest': np.array(lst_dest, dtype=np.int32).reshape(-1, n_pairs)}
+
+
+def convert_db(filename_db, filename_arr):
+	'''
+	Convert the bioreaction database to column arrays.
+
+	Parameters
+	----------
+	filename_db : string
+		Path of the bioreaction database (.xlsx)
+	filename_arr : string
+		Path of the output file (.npz)
+
+	Returns
+	-------
+	None
+	'''
+	print('>>> Converting bioreaction database to arrays... File name: ' + filename_arr)
+	wb_db = load_workbook(filename=filename_db, read_only=True)
+	arrays = {}
+	for key, sheet in sheets.items():
+		for name, arr in _read_sheet(wb_db[sheet], header_rows[key]).items():
+			arrays[key + '_' + name] = arr
+	np.savez(filename_arr, **arrays)
+	# not compressed, so that loading is a plain read
+	return None
+
+
+class ReactionDB(object):
+	'''
+	Column arrays of one sheet of the bioreaction database.
+
+	Attributes
+	----------
+	reac : numpy array of strings, reaction IDs
+	irrev : numpy array of int8, 1 = irreversible, 0 = reversible
+	src, dest : numpy arrays of int32, shape (n, 4), reactant pairs. 0 = empty.
+	index : dict, reaction ID -> row
+	'''
+	def __init__(self, reac, irrev, src, dest):
+		self.reac = reac
+		self.irrev = irrev
+		self.src = src
+		self.dest = dest
+		self.index = dict((r, i) for i, r in enumerate(reac.tolist()))
+
+	def __len__(self):
+		return len(self.reac)
+
+
+class ReactionPairTable(object):
+	'''
+	Directed reactant pairs of every reaction of one sheet, looked up by
+	reaction ID. The reverse pairs of reversible reactions are already
+	included, in the order obtain_pairs adds them: (src, dest) then
+	(dest, src), pair by pair.
+
+	Parameters
+	----------
+	db : ReactionDB
+	'''
+	def __init__(self, db):
+		self.pairs = {}
+		lst_irrev = db.irrev.tolist()
+		lst_src = db.src.tolist()
+		lst_dest = db.dest.tolist()
+		for idx, reac in enumerate(db.reac.tolist()):
+			pairs = []
+			for src, dest in zip(lst_src[idx], lst_dest[idx]):
+				if not src:
+					continue
+				pairs.append((src, dest))
+				if lst_irrev[idx] == 0:
+					pairs.append((dest, src))
+			self.pairs[reac] = tuple(pairs)
+
+	def __len__(self):
+		return len(self.pairs)
+
+	def __contains__(self, reac):
+		return reac in self.pairs
+
+	def get(self, reac):
+		'''
+		Directed pairs of a reaction (tuple of (int, int) tuples); empty
+		for a reaction that is not in the table.
+		'''
+		return self.pairs.get(reac, ())
+
+
+class CompoundIndex(object):
+	'''
+	Inverted index of one sheet: compound -> rows (reactions) whose
+	reactant pairs involve it. Built once, so that the reactions touching
+	a set of compounds are found without scanning the sheet.
+
+	Parameters
+	----------
+	db : ReactionDB
+
+	Attributes
+	----------
+	pairs : list of tuples of (int, int) tuples
+		Directed pairs of each row, reverse pairs of reversible reactions
+		included (see ReactionPairTable)
+	rows : dict
+		key - compound (int)
+		value - rows that involve it, in increasing order (list of ints)
+	'''
+	def __init__(self, db):
+		table = ReactionPairTable(db)
+		self.pairs = [table.get(reac) for reac in db.reac.tolist()]
+		self.rows = {}
+		for idx in range(0, len(self.pairs)):
+			for node in set(x for y in self.pairs[idx] for x in y):
+				self.rows.setdefault(node, []).append(idx)
+
+	def __len__(self):
+		return len(self.pairs)
+
+	def rows_of(self, nodes):
+		'''
+		Rows that involve any of the compounds, in increasing order
+		(list of ints).
+		'''
+		rows = set()
+		for node in nodes:
+			rows.update(self.rows.get(node, ()))
+		return sorted(rows)
+
+
+def load_db(filename_arr):
+	'''
+	Load the arrays written by convert_db.
+
+	Returns
+	-------
+	[db_en, db_sp] : ReactionDB of the 'Reactions' and the
+	'Non-enzymatic reactions' sheet
+	'''
+	data = np.load(filename_arr)
+	return [ReactionDB(*[data[key + '_' + name] for name in ('reac', 'irrev', 'src', 'dest')]) for key in ('en', 'sp')]
+
+
+def obtain_db(filename_db):
+	'''
+	Load the arrays of a bioreaction database, converting it first if
+	there is no up-to-date .npz file next to the .xlsx file.
+	'''
+	filename_arr = os.path.splitext(filename_db)[0] + '.npz'
+	if not os.path.exists(filename_arr) or os.path.getmtime(filename_arr) < os.path.getmtime(filename_db):
+		convert_db(filename_db, filename_arr)
+	return load_db(filename_arr)
@@ -3,21 +3,244 @@
 request_api_functions
 ~~~~~~~~~~~~~
 
-Contains functions that save information to .xlsx files.
+Contains functions that save information to table files.
+
+All tables are written row by row through a TableSink. The format
+follows the file extension:
+	.xlsx - xlsxwriter in constant_memory mode (each row is flushed to
+	        disk once the next one starts)
+	.csv  - comma separated
+	.tsv  - tab separated
+	.npz  - binary, one string array per column (see TableSink); cells
+	        are spooled to a temporary file and the arrays written from
+	        there at close
+read_table reads any of them back as lists of strings.
 
 python 2.7.5
 Nov 10, 2017
 
 '''
+import csv
+import os
+import shutil
+import struct
+import tempfile
+import zipfile
+
+import numpy as np
+from openpyxl import load_workbook
 from xlsxwriter import Workbook
 
+
+table_formats = ('xlsx', 'csv', 'tsv', 'npz')
+
+
+def _open_npy(filename, dtype, n):
+	'''
+	Open a .npy file of a 1-d array of length n for writing, header
+	written. The caller writes the n items as raw bytes.
+	'''
+	fp = open(filename, 'wb')
+	np.lib.format.write_array_header_1_0(fp, {'descr': np.lib.format.dtype_to_descr(dtype),
+		'fortran_order': False, 'shape': (n,)})
+	return fp
+
+
+class TableSink(object):
+	'''
+	Streaming writer of one table with a header row.
+
+	Parameters
+	----------
+	filename : string
+		Path of the file. The extension selects the format.
+	header_lst : list of strings
+		Column names. Rows given as dictionaries are mapped to columns
+		through a column map built once from this list.
+
+	In the .npz format every cell is kept as a string. Rows that are
+	longer than the header (e.g. the reactions of an EC) are stored
+	row-major in 'cells' with row offsets in 'indptr'; otherwise there is
+	one array per column, named 'col_<j>', and the header in 'header'.
+	The cells go to a temporary spool file next to filename as they are
+	written; close() writes the arrays from there, one cell at a time,
+	since the width of the string arrays is only known at the end.
+	'''
+	def __init__(self, filename, header_lst):
+		self.filename = filename
+		self.fmt = os.path.splitext(filename)[1].lstrip('.').lower()
+		if self.fmt not in table_formats:
+			raise ValueError('Unknown table format: ' + filename)
+		self.header = list(header_lst)
+		self.col_of = dict((key, col) for col, key in enumerate(self.header))
+		self.n_rows = 0
+		if self.fmt == 'xlsx':
+			self._wb = Workbook(filename, {'constant_memory': True})
+			self._ws = self._wb.add_worksheet("Sheet 1")
+		elif self.fmt == 'npz':
+			self._tmp = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(filename)))
+			self._cells = open(os.path.join(self._tmp, 'cells'), 'wb')
+			self._rows = open(os.path.join(self._tmp, 'rows'), 'wb')
+			# length-prefixed cells; number of cells per row (int64)
+			self._n_cells = 0
+			self._width = 1
+			self._rect = True
+		else:
+			self._fp = open(filename, 'wb')
+			self._writer = csv.writer(self._fp, delimiter='\t' if self.fmt == 'tsv' else ',', lineterminator='\n')
+		self._write(self.header)
+
+	def _write(self, values):
+		if self.fmt == 'xlsx':
+			self._ws.write_row(self.n_rows, 0, values)
+		elif self.fmt == 'npz':
+			if self.n_rows:
+				for value in values:
+					cell = str(value)
+					self._cells.write(struct.pack('<I', len(cell)) + cell)
+					self._width = max(self._width, len(cell))
+				self._rows.write(struct.pack('<q', len(values)))
+				self._n_cells = self._n_cells + len(values)
+				if len(values) != len(self.header):
+					self._rect = False
+		else:
+			self._writer.writerow(values)
+		self.n_rows = self.n_rows + 1
+		return None
+
+	def write_row(self, values):
+		'''
+		Write one row given as a list of cell values, in column order.
+		'''
+		return self._write(values)
+
+	def write_dict(self, record):
+		'''
+		Write one row given as a dictionary keyed by column name.
+		'''
+		values = [''] * len(self.header)
+		for _key, _value in record.items():
+			values[self.col_of[_key]] = _value
+		return self._write(values)
+
+	def close(self):
+		if self.fmt == 'xlsx':
+			self._wb.close()
+		elif self.fmt == 'npz':
+			self._close_npz()
+		else:
+			self._fp.close()
+		return None
+
+	def _close_npz(self):
+		self._cells.close()
+		self._rows.close()
+		tmp = self._tmp
+		n_col = len(self.header)
+		dtype = np.dtype('S%d' % self._width)
+		np.save(os.path.join(tmp, 'header.npy'), np.array(self.header, dtype=str))
+
+		if self._rect:
+			names = ['col_%d' % col for col in range(0, n_col)]
+			lst_fp = [_open_npy(os.path.join(tmp, name + '.npy'), dtype, self.n_rows - 1) for name in names]
+		else:
+			names = ['cells', 'indptr']
+			lst_fp = [_open_npy(os.path.join(tmp, 'cells.npy'), dtype, self._n_cells)]
+		with open(os.path.join(tmp, 'cells'), 'rb') as fp_cells:
+			for i in range(0, self._n_cells):
+				n = struct.unpack('<I', fp_cells.read(4))[0]
+				lst_fp[i % len(lst_fp)].write(fp_cells.read(n).ljust(self._width, b'\0'))
+		for fp in lst_fp:
+			fp.close()
+
+		if not self._rect:
+			with open(os.path.join(tmp, 'rows'), 'rb') as fp_rows:
+				fp = _open_npy(os.path.join(tmp, 'indptr.npy'), np.dtype(np.int64), self.n_rows)
+				total = 0
+				fp.write(struct.pack('<q', total))
+				while True:
+					chunk = fp_rows.read(8 << 16)
+					if not chunk:
+						break
+					indptr = np.cumsum(np.frombuffer(chunk, dtype='<i8')) + total
+					fp.write(indptr.astype('<i8').tobytes())
+					total = int(indptr[-1])
+				fp.close()
+
+		zf = zipfile.ZipFile(self.filename + '.tmp', 'w', zipfile.ZIP_STORED, allowZip64=True)
+		for name in ['header'] + names:
+			zf.write(os.path.join(tmp, name + '.npy'), name + '.npy')
+		zf.close()
+		os.rename(self.filename + '.tmp', self.filename)
+		shutil.rmtree(tmp)
+		return None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+		return False
+
+
+def find_table(filename):
+	'''
+	Path of a table in any format. filename may have any of the
+	extensions in table_formats; the first existing file in the order
+	of table_formats is returned, or None.
+	'''
+	base = os.path.splitext(filename)[0]
+	for fmt in table_formats:
+		if os.path.exists(base + '.' + fmt):
+			return base + '.' + fmt
+	return None
+
+
+def read_table(filename, encode=True):
+	'''
+	Generator of the rows of a table written by TableSink (or by an
+	older version of this module), header first. Cells are strings;
+	trailing empty cells of .xlsx rows are None.
+
+	.xlsx files are streamed in read-only, values-only mode. With
+	encode=False their cells are left as read (unicode), which saves
+	one call per cell when only a few of them are kept.
+	'''
+	fmt = os.path.splitext(filename)[1].lstrip('.').lower()
+	if fmt == 'xlsx':
+		wb = load_workbook(filename=filename, read_only=True)
+		ws = wb['Sheet 1']
+		for row in ws.iter_rows(values_only=True):
+			if encode:
+				yield [x.encode('ascii','ignore') if x is not None else None for x in row]
+			else:
+				yield list(row)
+	elif fmt == 'npz':
+		data = np.load(filename)
+		yield data['header'].tolist()
+		if 'indptr' in data.files:
+			cells = data['cells'].tolist()
+			indptr = data['indptr'].tolist()
+			for i in range(0, len(indptr) - 1):
+				yield cells[indptr[i]:indptr[i+1]]
+		else:
+			n_col = len(data['header'])
+			columns = [data['col_%d' % col].tolist() for col in range(0, n_col)]
+			for row in zip(*columns):
+				yield list(row)
+	else:
+		with open(filename, 'rb') as fp:
+			for row in csv.reader(fp, delimiter='\t' if fmt == 'tsv' else ','):
+				yield row
+
+
 def savexls_org(dir, filename, lst_org):
 	'''
-	Save organism info into a .xlsx file.
+	Save organism info into a table file.
 
 	Parameters
 	----------
-	dir : string 
+	dir : string
 		Directory to save the file
 		End this string with '/'
 	filename : string
@@ -32,22 +255,9 @@ def savexls_org(dir, filename, lst_org):
 	'''
 	print('>>> Saving organism info... File name: '+ filename)
 
-	header_lst = ['Code','Abbr','Name','Type']
-	wb_org = Workbook(dir + filename)
-	ws_org = wb_org.add_worksheet("Sheet 1")
-
-	header_row = 0 
-	for col in range(0,len(header_lst)):
-		ws_org.write(header_row, col, header_lst[col])
-
-	row = 1
-	for org in lst_org:
-		for _key, _value in org.items():
-			col = header_lst.index(_key)
-			ws_org.write(row, col, _value)
-		row = row + 1
-	
-	wb_org.close()
+	with TableSink(dir + filename, ['Code','Abbr','Name','Type']) as sink:
+		for org in lst_org:
+			sink.write_dict(org)
 
 	return None
 
@@ -56,11 +266,11 @@ def savexls_org(dir, filename, lst_org):
 
 def savexls_bact(dir, filename, lst_bact):
 	'''
-	Save bacteria info into a .xlsx file.
+	Save bacteria info into a table file.
 
 	Parameters
 	----------
-	dir : string 
+	dir : string
 		Directory to save the file
 		End this string with '/'
 	filename : string
@@ -75,69 +285,79 @@ def savexls_bact(dir, filename, lst_bact):
 	'''
 	print('>>> Saving bacteria info... File name: '+ filename)
 
+	with TableSink(dir + filename, ['Code','Abbr','Name','Type']) as sink:
+		for bact in lst_bact:
+			sink.write_dict(bact)
 
-	header_lst = ['Code','Abbr','Name','Type']
-	wb_bact = Workbook(dir + filename)
-	ws_bact = wb_bact.add_worksheet("Sheet 1")
+	return None
 
-	header_row = 0 
-	for col in range(0,len(header_lst)):
-		ws_bact.write(header_row, col, header_lst[col])
 
-	row = 1 
-	for bact in lst_bact:
-		for _key, _value in bact.items():
-			col = header_lst.index(_key)
-			ws_bact.write(row, col, _value)
-		row = row + 1
 
-	wb_bact.close()
+def savexls_enzyme(dir, filename, lst_enzyme):
+	'''
+	Save enzyme list into a table file.
 
-	return None 
+	Parameters
+	----------
+	dir : string
+		Directory to save the file
+		End this string with '/'
+	filename : string
+		Desired name for the file
+	lst_enzyme : list of dictionaries
+		List of enzyme information. Each dictinary
+		contains keys: 'Code','Name'
+
+	Returns
+	-------
+	None
+	'''
+	print('>>> Saving enzyme list... File name: '+ filename)
+
+	with TableSink(dir + filename, ['Code','Name']) as sink:
+		for enzyme in lst_enzyme:
+			sink.write_dict(enzyme)
+
+	return None
 
 
 
-def savexls_ec_bact(dir, filename, lst_ec_bact, lst_abbr):
+def savexls_ec_bact(dir, filename, matrix):
 	'''
-	Save enzyme - bacteria relations into a .xlsx file.
+	Save enzyme - bacteria relations into a table file.
 
 	Parameters
 	----------
-	dir : string 
+	dir : string
 		Directory to save the file
 		End this string with '/'
 	filename : string
-		Desired name for the file
-	lst_ec_bact : list of dictionaries
-		List of EC - bacteria relations. Each dictinary
-		contains keys: 'EC' and bacteria names. 
+		Desired name for the file. A .npz file is the sparse matrix
+		itself (ec_matrix_functions.ECBactMatrix.save).
+	matrix : ec_matrix_functions.ECBactMatrix
+		EC - bacteria relations. Written as one row per EC and one
+		column per bacterium (header: 'EC' and bacteria names).
 		'1' means the enzyme is encoded by this bacteria.
 		'0' means the enzyme is not encoded by this bacteria.
-	lst_abbr : list of strings
-		Serve as headers
 
 	Returns
 	-------
 	None
 	'''
 	print('>>> Saving EC - bacteria relations... File name: '+ filename)
-	
-	header_lst = ['EC'] + lst_abbr
-	wb_ec_bact = Workbook(dir + filename)
-	ws_ec_bact = wb_ec_bact.add_worksheet("Sheet 1")
 
-	header_row = 0 
-	for col in range(0,len(header_lst)):
-		ws_ec_bact.write(header_row, col, header_lst[col])
+	if filename.endswith('.npz'):
+		matrix.save(dir + filename)
+		return None
 
-	row = 1 
-	for unit in lst_ec_bact:
-		for _key, _value in unit.items():
-			col = header_lst.index(_key)
-			ws_ec_bact.write(row, col, _value)
-		row = row + 1
-
-	wb_ec_bact.close()
+	n_bact = len(matrix.bact)
+	lst_ec = matrix.ec.tolist()
+	with TableSink(dir + filename, ['EC'] + matrix.bact.tolist()) as sink:
+		for i in range(0, len(lst_ec)):
+			values = ['0'] * n_bact
+			for col in matrix.indices[matrix.indptr[i]:matrix.indptr[i+1]].tolist():
+				values[col] = '1'
+			sink.write_row([lst_ec[i]] + values)
 
 	return None
 
@@ -145,18 +365,18 @@ def savexls_ec_bact(dir, filename, lst_ec_bact, lst_abbr):
 
 def savexls_ec_reac(dir, filename, lst_ec_reac):
 	'''
-	Save enzyme - reaction relations into a .xlsx file.
+	Save enzyme - reaction relations into a table file.
 
 	Parameters
 	----------
-	dir : string 
+	dir : string
 		Directory to save the file
 		End this string with '/'
 	filename : string
 		Desired name for the file
 	lst_ec_reac: list of dictionaries
 		List of EC - reaction relations. Each dictinary
-		contains keys: 'EC' and 'Reactions'. 
+		contains keys: 'EC' and 'Reactions'.
 		'Reactions' corresponds to a list of strings,
 		which are the names of the reactions.
 
@@ -166,21 +386,8 @@ def savexls_ec_reac(dir, filename, lst_ec_reac):
 	'''
 	print('>>> Saving EC - reaction relations... File name: '+ filename)
 
-	wb_ec_reac = Workbook(dir + filename)
-	ws_ec_reac = wb_ec_reac.add_worksheet("Sheet 1")
-
-	ws_ec_reac.write(0, 0, 'EC')
-	ws_ec_reac.write(0, 1, 'Reactions')
-
-	row = 1
-	for unit in lst_ec_reac:
-		ws_ec_reac.write(row, 0, unit['EC'])
-		col = 1;
-		for reac in unit['Reactions']:
-			ws_ec_reac.write(row, col, reac)
-			col = col + 1
-		row = row + 1
+	with TableSink(dir + filename, ['EC','Reactions']) as sink:
+		for unit in lst_ec_reac:
+			sink.write_row([unit['EC']] + list(unit['Reactions']))
 
-	wb_ec_reac.close()
-
-	return None
\ No newline at end of file
+	return None
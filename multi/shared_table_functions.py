@@ -0,0 +1,205 @@
+'''
+
+shared_table_functions
+~~~~~~~~~~~~~
+
+Contains read-only lookup tables shared by all workers of a Pool.
+
+dict_bact_ec and dict_ec_pairs are written once as flat arrays (.npy)
+in CSR form. Each worker maps them into memory once, in the Pool
+initializer, so the operating system shares the pages between all
+processes and nothing is pickled per task.
+
+	compound                             KEGG compound numbers, see
+	                                     compound_functions.CompoundTable
+	bact (names), bact_indptr, bact_ec   bacterium -> EC indices
+	ec (names), ec_indptr, ec_pairs      EC -> (src, dest) pairs, int32 (n, 2)
+	net_indptr, net_edges                bacterium -> its enzymatic pairs, int32
+	                                     (n, 2), see network_batch_functions
+	bact_sp_indptr, bact_sp              bacterium -> non-enzymatic pairs added
+	                                     per organism, int32 (n, 2)
+
+Every pair array holds dense compound IDs of the one compound table, not
+KEGG numbers. They are used as they are through the whole network
+pipeline; compound_ids converts them back for the outputs.
+
+python 2.7.5
+
+'''
+import hashlib
+import os
+
+import numpy as np
+
+import compound_functions as cpf
+import network_batch_functions as nbf
+
+
+_tables = {}
+# filled by attach() in each worker
+
+
+def write_tables(dirname, lst_bact, dict_bact_ec, dict_ec_pairs, dict_bact_sp=None):
+	'''
+	Write the lookup tables.
+
+	Parameters
+	----------
+	dirname : string
+		Directory for the tables. End this string with '/'
+	lst_bact : list of strings
+		Names of the bacteria
+	dict_bact_ec : dict
+		key - bacteria names (string)
+		value - list of enzymes (list of strings)
+	dict_ec_pairs : dict
+		key - enzymes (string)
+		value - list of reactant pairs (list of tuples)
+	dict_bact_sp : dict or None
+		key - bacteria names (string)
+		value - pairs of non-enzymatic reactions of this bacterium, see
+		multi_utils.obtain_bact_sp (list of tuples)
+
+	Returns
+	-------
+	None
+	'''
+	if not os.path.isdir(dirname):
+		os.makedirs(dirname)
+	lst_ec = sorted(dict_ec_pairs)
+	ec_index = dict((ec, i) for i, ec in enumerate(lst_ec))
+
+	ec_indptr = [0]
+	ec_pairs = []
+	for ec in lst_ec:
+		ec_pairs.extend(dict_ec_pairs[ec])
+		ec_indptr.append(len(ec_pairs))
+
+	bact_indptr = [0]
+	bact_ec = []
+	for bact in lst_bact:
+		bact_ec.extend(ec_index[ec] for ec in dict_bact_ec.get(bact, []) if ec in ec_index)
+		# ECs without reactant pairs contribute nothing
+		bact_indptr.append(len(bact_ec))
+
+	bact_sp_indptr = [0]
+	bact_sp = []
+	for bact in lst_bact:
+		if dict_bact_sp is not None:
+			bact_sp.extend(dict_bact_sp.get(bact, []))
+		bact_sp_indptr.append(len(bact_sp))
+
+	[net_indptr, net_edges] = nbf.batch_pairs(lst_bact, dict_bact_ec, dict_ec_pairs)
+	ec_pairs = np.array(ec_pairs, dtype=np.int32).reshape(-1, 2)
+	bact_sp = np.array(bact_sp, dtype=np.int32).reshape(-1, 2)
+	table = cpf.CompoundTable.from_arrays([ec_pairs, bact_sp])
+
+	arrays = {'compound': table.compounds,
+		'bact': np.array(lst_bact, dtype=str),
+		'bact_indptr': np.array(bact_indptr, dtype=np.int64),
+		'bact_ec': np.array(bact_ec, dtype=np.int32),
+		'ec': np.array(lst_ec, dtype=str),
+		'ec_indptr': np.array(ec_indptr, dtype=np.int64),
+		'ec_pairs': table.intern(ec_pairs),
+		'net_indptr': net_indptr,
+		'net_edges': table.intern(net_edges),
+		'bact_sp_indptr': np.array(bact_sp_indptr, dtype=np.int64),
+		'bact_sp': table.intern(bact_sp)}
+	for name, arr in arrays.items():
+		np.save(dirname + name + '.npy', arr)
+	return None
+
+
+def attach(dirname):
+	'''
+	Map the tables into memory (read-only). Use as Pool initializer.
+	'''
+	_tables.clear()
+	for name in ('compound', 'bact', 'bact_indptr', 'bact_ec', 'ec', 'ec_indptr', 'ec_pairs', 'net_indptr', 'net_edges', 'bact_sp_indptr', 'bact_sp'):
+		_tables[name] = np.load(dirname + name + '.npy', mmap_mode='r')
+	_tables['bact_index'] = dict((b, i) for i, b in enumerate(_tables['bact'].tolist()))
+	_tables['table'] = cpf.CompoundTable(_tables['compound'])
+	return None
+
+
+def compound_ids(arr):
+	'''
+	KEGG compound numbers of an array of dense compound IDs.
+	'''
+	return _tables['table'].extern(arr)
+
+
+def bact_ec_index(bact):
+	'''
+	Row numbers (into the EC table) of the enzymes of a bacterium.
+	'''
+	j = _tables['bact_index'][bact]
+	return _tables['bact_ec'][_tables['bact_indptr'][j]:_tables['bact_indptr'][j+1]]
+
+
+def ec_pairs(i):
+	'''
+	Reactant pairs of the EC in row i, as an int32 array of shape (n, 2)
+	of dense compound IDs.
+	'''
+	return _tables['ec_pairs'][_tables['ec_indptr'][i]:_tables['ec_indptr'][i+1]]
+
+
+def network(bact):
+	'''
+	Enzymatic reactant pairs of a bacterium, as an int32 array of shape
+	(n, 2) of dense compound IDs.
+	'''
+	j = _tables['bact_index'][bact]
+	return _tables['net_edges'][_tables['net_indptr'][j]:_tables['net_indptr'][j+1]]
+
+
+def bact_sp_pairs(bact):
+	'''
+	Non-enzymatic pairs added to a bacterium per organism, as an int32
+	array of shape (n, 2) of dense compound IDs.
+	'''
+	j = _tables['bact_index'][bact]
+	return _tables['bact_sp'][_tables['bact_sp_indptr'][j]:_tables['bact_sp_indptr'][j+1]]
+
+
+def fingerprint(bact):
+	'''
+	Fingerprints of a bacterium (hex strings): of its EC set (ECs with
+	reactant pairs, sorted) and of its network (enzymatic pairs, which
+	are in canonical order, and non-enzymatic pairs). Bacteria with the
+	same network fingerprint have identical networks.
+
+	Returns
+	-------
+	[fp_ec, fp_net]
+	'''
+	fp_ec = hashlib.sha1(np.sort(bact_ec_index(bact)).astype(np.int32).tobytes()).hexdigest()
+	h = hashlib.sha1(np.ascontiguousarray(network(bact)).tobytes())
+	h.update(b'|')
+	h.update(np.ascontiguousarray(bact_sp_pairs(bact)).tobytes())
+	return [fp_ec, h.hexdigest()]
+
+
+def group_networks(lst_bact):
+	'''
+	Group the bacteria that have identical networks.
+
+	Returns
+	-------
+	groups : list of lists of strings
+		One list per distinct network, in the order of lst_bact. The
+		first bacterium of each list is its representative.
+	'''
+	dict_group = {}
+	groups = []
+	set_ec = set()
+	for bact in lst_bact:
+		[fp_ec, fp_net] = fingerprint(bact)
+		set_ec.add(fp_ec)
+		if fp_net not in dict_group:
+			dict_group[fp_net] = []
+			groups.append(dict_group[fp_net])
+		dict_group[fp_net].append(bact)
+	print('>>> ' + str(len(lst_bact)) + ' bacteria, ' + str(len(set_ec)) + ' distinct EC sets, ' + str(len(groups)) + ' distinct networks')
+	return groups
@@ -0,0 +1,247 @@
+'''
+
+snapshot_store_functions
+~~~~~~~~~~~~~
+
+Contains a versioned, deduplicated store of the dated database tables.
+
+Every table of a snapshot is kept as a list of records (one per row,
+cells joined by tabs), cut into chunks at content-defined boundaries: a
+chunk ends after a record whose hash is 0 modulo avg_chunk, so adding or
+changing a record only changes the chunk it is in. Chunks are stored
+zlib-compressed under the SHA-1 of their content (objects/), so every
+chunk that did not change since an earlier date is kept once. A small
+manifest per date (snapshots/<date>.json) lists the chunks of each
+table.
+
+The EC - bacteria table is stored sparse, one record per EC: the EC
+number followed by the bacteria that encode it. Adding a bacterium
+changes only the records of its ECs, not every row.
+
+python 2.7.5
+
+'''
+import hashlib
+import json
+import os
+import zlib
+
+import ec_matrix_functions as emf
+import request_api_functions as rf
+
+
+tables = [('organism', 'KEGG_organism_'), ('bacteria', 'KEGG_bacteria_'),
+	('enzyme', 'KEGG_enzyme_'), ('ec_bact', 'KEGG_EC_bact_'), ('ec_reac', 'KEGG_EC_reac_')]
+# table name, prefix of the dated file
+avg_chunk = 64
+max_chunk = 1024
+# records per chunk: about avg_chunk on average, never more than max_chunk
+
+
+def _sha1(text):
+	return hashlib.sha1(text).hexdigest()
+
+
+def _encode(record):
+	return '\t'.join('' if x is None else x for x in record)
+
+
+def _put(store_dir, text):
+	key = _sha1(text)
+	filename = store_dir + 'objects/' + key
+	if not os.path.exists(filename):
+		with open(filename + '.tmp', 'wb') as fp:
+			fp.write(zlib.compress(text))
+		os.rename(filename + '.tmp', filename)
+	return key
+
+
+def _get(store_dir, key):
+	with open(store_dir + 'objects/' + key, 'rb') as fp:
+		return zlib.decompress(fp.read())
+
+
+def _chunks(records):
+	lines = []
+	for record in records:
+		line = _encode(record)
+		lines.append(line)
+		if len(lines) >= max_chunk or int(_sha1(line)[:8], 16) % avg_chunk == 0:
+			yield '\n'.join(lines)
+			lines = []
+	if lines:
+		yield '\n'.join(lines)
+
+
+def _records(dir, prefix, date):
+	'''
+	[header, generator of records] of a dated table in dir.
+	'''
+	if prefix == 'KEGG_EC_bact_' and os.path.exists(dir + prefix + date + '.npz'):
+		matrix = emf.ECBactMatrix.load(dir + prefix + date + '.npz')
+		return [['EC'] + matrix.bact.tolist(), ([ec] + bacts for ec, bacts in matrix.iter_rows())]
+	filename = rf.find_table(dir + prefix + date + '.xlsx')
+	if filename is None:
+		return [None, None]
+	rows = rf.read_table(filename)
+	header = next(rows)
+	if prefix == 'KEGG_EC_bact_':
+		lst_bact = header[1:]
+		rows = ([row[0]] + [lst_bact[i] for i in range(0, len(lst_bact)) if row[i+1] == '1'] for row in rows)
+	else:
+		rows = ([x for x in row if x] if prefix == 'KEGG_EC_reac_' else row for row in rows)
+	return [header, rows]
+
+
+def commit(store_dir, dir, date):
+	'''
+	Add the dated tables of one snapshot to the store.
+
+	Parameters
+	----------
+	store_dir : string
+		Directory of the store. End this string with '/'
+	dir : string
+		Directory of the dated tables (any format of request_api_functions).
+		End this string with '/'
+	date : string
+		Date of the snapshot, e.g. '2017-11-10'
+
+	Returns
+	-------
+	n_new : int
+		Number of chunks that were not in the store yet
+	'''
+	print('>>> Adding snapshot of ' + date + ' to the store...')
+	for sub in ('objects', 'snapshots'):
+		if not os.path.isdir(store_dir + sub):
+			os.makedirs(store_dir + sub)
+	n_objects = len(os.listdir(store_dir + 'objects'))
+	manifest = {'date': date, 'tables': {}}
+	for name, prefix in tables:
+		[header, records] = _records(dir, prefix, date)
+		if header is None:
+			continue
+		manifest['tables'][name] = {'header': _put(store_dir, _encode(header)),
+			'chunks': [_put(store_dir, chunk) for chunk in _chunks(records)]}
+	with open(store_dir + 'snapshots/' + date + '.json.tmp', 'w') as fp:
+		json.dump(manifest, fp, indent=1, sort_keys=True)
+	os.rename(store_dir + 'snapshots/' + date + '.json.tmp', store_dir + 'snapshots/' + date + '.json')
+	return len(os.listdir(store_dir + 'objects')) - n_objects
+
+
+def list_snapshots(store_dir):
+	'''
+	Dates of the snapshots in the store (list of strings), oldest first.
+	'''
+	if not os.path.isdir(store_dir + 'snapshots'):
+		return []
+	return sorted(x[:-len('.json')] for x in os.listdir(store_dir + 'snapshots') if x.endswith('.json'))
+
+
+def _manifest(store_dir, date):
+	with open(store_dir + 'snapshots/' + date + '.json') as fp:
+		return json.load(fp)
+
+
+def read(store_dir, date, name):
+	'''
+	Header and records of one table of a snapshot.
+
+	Parameters
+	----------
+	name : string
+		'organism', 'bacteria', 'enzyme', 'ec_bact' or 'ec_reac'
+
+	Returns
+	-------
+	[header, records] : list of strings, generator of lists of strings.
+	Records of 'ec_bact' are the EC number followed by its bacteria.
+	'''
+	table = _manifest(store_dir, date)['tables'][name]
+	header = _get(store_dir, str(table['header'])).split('\t')
+
+	def records():
+		for key in table['chunks']:
+			for line in _get(store_dir, str(key)).split('\n'):
+				yield line.split('\t')
+
+	return [header, records()]
+
+
+def checkout(store_dir, date, dir, table_format='xlsx'):
+	'''
+	Write the dated tables of a snapshot back to dir, in any format of
+	request_api_functions, so that every reader of the database (e.g.
+	update_functions.read_snapshot, multi_utils.obtain_dict) can use it.
+
+	Returns
+	-------
+	None
+	'''
+	print('>>> Restoring snapshot of ' + date + '...')
+	manifest = _manifest(store_dir, date)
+	for name, prefix in tables:
+		if name not in manifest['tables']:
+			continue
+		[header, records] = read(store_dir, date, name)
+		filename = prefix + date + '.' + table_format
+		if name == 'ec_bact':
+			lst_ec = []
+			rows = []
+			for record in records:
+				lst_ec.append(record[0])
+				rows.append(record[1:])
+			matrix = emf.ECBactMatrix.from_sets(lst_ec, header[1:], rows)
+			rf.savexls_ec_bact(dir, filename, matrix)
+			if table_format != 'npz':
+				matrix.save(dir + prefix + date + '.npz')
+		else:
+			with rf.TableSink(dir + filename, header) as sink:
+				for record in records:
+					sink.write_row(record)
+	return None
+
+
+def diff(store_dir, date_a, date_b, name):
+	'''
+	Records that differ between two snapshots of one table. Only the
+	chunks that are not shared by both snapshots are read.
+
+	Parameters
+	----------
+	date_a, date_b : string
+		Older and newer snapshot
+	name : string
+		Table name, see read
+
+	Returns
+	-------
+	result : dictionary
+		'added' - records only in date_b
+		'removed' - records only in date_a
+		'changed' - (record in date_a, record in date_b) tuples, for
+		records with the same first cell (key) and different content
+		'header' - True if the header changed (e.g. bacteria added)
+	'''
+	table_a = _manifest(store_dir, date_a)['tables'][name]
+	table_b = _manifest(store_dir, date_b)['tables'][name]
+	set_a = set(table_a['chunks'])
+	set_b = set(table_b['chunks'])
+
+	def records(lst_key, shared):
+		dict_record = {}
+		for key in lst_key:
+			if key in shared:
+				continue
+			for line in _get(store_dir, str(key)).split('\n'):
+				record = line.split('\t')
+				dict_record[record[0]] = record
+		return dict_record
+
+	old = records(table_a['chunks'], set_b)
+	new = records(table_b['chunks'], set_a)
+	return {'added': [new[k] for k in new if k not in old],
+		'removed': [old[k] for k in old if k not in new],
+		'changed': [(old[k], new[k]) for k in old if k in new and old[k] != new[k]],
+		'header': table_a['header'] != table_b['header']}
@@ -0,0 +1,160 @@
+'''
+
+sqlite_functions
+~~~~~~~~~~~~~
+
+Contains an embedded SQLite copy of the local KEGG database and a small
+query API on top of it, so that a consumer can read only the slice it
+needs instead of loading every pickle.
+
+Tables (every key column is indexed):
+	organism(abbr, code, name, type)     abbr in upper case, e.g. 'ECO'
+	enzyme(ec, name)
+	ec_bact(ec, abbr)                    EC - organism relations
+	ec_reac(ec, reac)                    EC - reaction relations
+	reac_pair(reac, src, dest, sp)       directed reactant pairs; reverse
+	                                     pairs of reversible reactions are
+	                                     included. sp = 1 for non-enzymatic
+	                                     reactions.
+
+python 2.7.5
+
+'''
+import sqlite3
+
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS organism (abbr TEXT PRIMARY KEY, code TEXT, name TEXT, type TEXT);
+CREATE TABLE IF NOT EXISTS enzyme (ec TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE IF NOT EXISTS ec_bact (ec TEXT NOT NULL, abbr TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS ec_reac (ec TEXT NOT NULL, reac TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS reac_pair (reac TEXT NOT NULL, src INTEGER NOT NULL, dest INTEGER NOT NULL, sp INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS ec_bact_ec ON ec_bact (ec);
+CREATE INDEX IF NOT EXISTS ec_bact_abbr ON ec_bact (abbr);
+CREATE INDEX IF NOT EXISTS ec_reac_ec ON ec_reac (ec);
+CREATE INDEX IF NOT EXISTS ec_reac_reac ON ec_reac (reac);
+CREATE INDEX IF NOT EXISTS reac_pair_reac ON reac_pair (reac);
+'''
+
+
+def connect(filename):
+	'''
+	Open (and create if needed) a KEGG SQLite database.
+
+	Returns
+	-------
+	conn : sqlite3.Connection
+	'''
+	conn = sqlite3.connect(filename)
+	conn.text_factory = str
+	conn.executescript(_schema)
+	return conn
+
+
+def load_request(conn, lst_org, lst_enzyme, matrix_ec_bact, lst_ec_reac):
+	'''
+	Bulk load the output of multi_utils.request_api in one transaction.
+	Existing rows of these tables are replaced.
+
+	Parameters
+	----------
+	conn : sqlite3.Connection
+	lst_org : list of dictionaries
+		keys 'Code','Abbr','Name','Type'
+	lst_enzyme : list of dictionaries
+		keys 'Code','Name'
+	matrix_ec_bact : ec_matrix_functions.ECBactMatrix
+		EC - bacteria relations
+	lst_ec_reac : list of dictionaries
+		keys 'EC' and 'Reactions'
+
+	Returns
+	-------
+	None
+	'''
+	print('>>> Loading KEGG database into SQLite...')
+	with conn:
+		for table in ('organism', 'enzyme', 'ec_bact', 'ec_reac'):
+			conn.execute('DELETE FROM ' + table)
+		conn.executemany('INSERT OR REPLACE INTO organism VALUES (?, ?, ?, ?)',
+			((x['Abbr'].upper(), x['Code'], x['Name'], x['Type']) for x in lst_org))
+		conn.executemany('INSERT OR REPLACE INTO enzyme VALUES (?, ?)',
+			((x['Code'].replace('ec:', ''), x['Name']) for x in lst_enzyme))
+		conn.executemany('INSERT INTO ec_bact VALUES (?, ?)',
+			((ec, bact) for ec, bacts in matrix_ec_bact.iter_rows() for bact in bacts))
+		conn.executemany('INSERT INTO ec_reac VALUES (?, ?)',
+			((x['EC'], reac) for x in lst_ec_reac for reac in x['Reactions']))
+	return None
+
+
+def load_reaction_db(conn, db_en, db_sp):
+	'''
+	Bulk load the reactant pairs of the bioreaction database in one
+	transaction. Existing pairs are replaced.
+
+	Parameters
+	----------
+	conn : sqlite3.Connection
+	db_en, db_sp : reaction_db_functions.ReactionDB
+		Arrays of the 'Reactions' and 'Non-enzymatic reactions' sheets
+
+	Returns
+	-------
+	None
+	'''
+	def rows(db, sp):
+		lst_reac = db.reac.tolist()
+		for idx in range(0, len(db)):
+			for src, dest in zip(db.src[idx].tolist(), db.dest[idx].tolist()):
+				if not src:
+					continue
+				yield (lst_reac[idx], src, dest, sp)
+				if db.irrev[idx] == 0:
+					yield (lst_reac[idx], dest, src, sp)
+
+	with conn:
+		conn.execute('DELETE FROM reac_pair')
+		conn.executemany('INSERT INTO reac_pair VALUES (?, ?, ?, ?)', rows(db_en, 0))
+		conn.executemany('INSERT INTO reac_pair VALUES (?, ?, ?, ?)', rows(db_sp, 1))
+	return None
+
+
+def ecs_of_organism(conn, abbr):
+	'''
+	ECs encoded by an organism (list of strings).
+	'''
+	return [x[0] for x in conn.execute('SELECT ec FROM ec_bact WHERE abbr = ? ORDER BY ec', (abbr.upper(),))]
+
+
+def organisms_of_ec(conn, ec):
+	'''
+	Organisms (upper-case abbrieviations) that encode an EC (list of strings).
+	'''
+	return [x[0] for x in conn.execute('SELECT abbr FROM ec_bact WHERE ec = ? ORDER BY abbr', (ec,))]
+
+
+def reactions_of_ec(conn, ec):
+	'''
+	Reactions catalyzed by an EC (list of strings).
+	'''
+	return [x[0] for x in conn.execute('SELECT reac FROM ec_reac WHERE ec = ?', (ec,))]
+
+
+def pairs_of_reaction(conn, reac):
+	'''
+	Directed reactant pairs of a reaction (list of (int, int) tuples).
+	'''
+	return [(x[0], x[1]) for x in conn.execute('SELECT src, dest FROM reac_pair WHERE reac = ? ORDER BY rowid', (reac,))]
+
+
+def pairs_of_organism(conn, abbr):
+	'''
+	Distinct directed reactant pairs of the enzymatic reactions of an
+	organism (list of (int, int) tuples). Non-enzymatic reactions are
+	not included.
+	'''
+	return [(x[0], x[1]) for x in conn.execute(
+		'SELECT DISTINCT p.src, p.dest FROM ec_bact b '
+		'JOIN ec_reac r ON r.ec = b.ec '
+		'JOIN reac_pair p ON p.reac = r.reac AND p.sp = 0 '
+		'WHERE b.abbr = ?', (abbr.upper(),))]
@@ -0,0 +1,161 @@
+'''
+
+update_functions
+~~~~~~~~~~~~~
+
+Contains functions for an incremental refresh of the local KEGG database.
+
+The new enzyme and organism lists are compared with a previous dated
+snapshot. Only ECs that are new, or whose name changed, are downloaded
+again. Newly added bacteria are filled in from the `link/ec/<org>`
+endpoint, one request per bacterium, and bacteria that disappeared are
+dropped. All other ECs are carried over from the snapshot unchanged.
+
+Gene re-annotations of existing bacteria that do not change the enzyme
+name are not visible in the lists; run a full refresh to pick them up.
+
+python 2.7.5
+
+'''
+import os
+
+import link_functions as lf
+import request_api_functions as rf
+import ec_matrix_functions as emf
+
+
+def _read_rows(filename):
+	filename_table = rf.find_table(filename)
+	if filename_table is None:
+		raise IOError('No such table: ' + filename)
+	return rf.read_table(filename_table)
+
+
+def read_snapshot(dir, date):
+	'''
+	Read a dated snapshot of the local KEGG database.
+
+	Parameters
+	----------
+	dir : string
+		Directory of the database files. End this string with '/'
+	date : string
+		Date of the snapshot, e.g. '2017-11-10'
+
+	Returns
+	-------
+	snapshot : dictionary
+		'abbr' - abbrieviations of bacteria, in column order (list of strings)
+		'ec_bact' - key: EC number, value: bacteria that encode it (list of strings)
+		'ec_reac' - key: EC number, value: reactions (list of strings)
+		'enzyme' - key: enzyme code, e.g. 'ec:1.1.1.1', value: name.
+		None if the snapshot has no enzyme list.
+	'''
+	print('>>> Reading snapshot of ' + date + '...')
+	filename_matrix = dir + 'KEGG_EC_bact_' + date + '.npz'
+	if os.path.exists(filename_matrix):
+		matrix = emf.ECBactMatrix.load(filename_matrix)
+		lst_abbr = matrix.bact.tolist()
+		dict_ec_bact = dict(matrix.iter_rows())
+	else:
+		rows = _read_rows(dir + 'KEGG_EC_bact_' + date + '.xlsx')
+		lst_abbr = next(rows)[1:]
+		dict_ec_bact = {}
+		for row in rows:
+			dict_ec_bact[row[0]] = [lst_abbr[i] for i in range(0, len(lst_abbr)) if row[i+1] == '1']
+
+	rows = _read_rows(dir + 'KEGG_EC_reac_' + date + '.xlsx')
+	next(rows)
+	dict_ec_reac = {}
+	for row in rows:
+		dict_ec_reac[row[0]] = [x for x in row[1:] if x]
+
+	dict_enzyme = None
+	filename_enzyme = dir + 'KEGG_enzyme_' + date + '.xlsx'
+	if rf.find_table(filename_enzyme) is not None:
+		rows = _read_rows(filename_enzyme)
+		next(rows)
+		dict_enzyme = {}
+		for row in rows:
+			dict_enzyme[row[0]] = row[1]
+
+	return {'abbr': lst_abbr, 'ec_bact': dict_ec_bact, 'ec_reac': dict_ec_reac, 'enzyme': dict_enzyme}
+
+
+def plan_update(snapshot, lst_enzyme, abbr_of_bacteria):
+	'''
+	Decide what has to be downloaded again.
+
+	Parameters
+	----------
+	snapshot : dictionary
+		Output of read_snapshot
+	lst_enzyme : list of dictionaries
+		Current enzyme list, keys 'Code' and 'Name'
+	abbr_of_bacteria : list of strings
+		Current abbrieviations of bacteria
+
+	Returns
+	-------
+	lst_ec_fetch : list of strings
+		ECs that are new or whose name changed
+	lst_abbr_new : list of strings
+		Bacteria that are not in the snapshot
+	'''
+	dict_enzyme = snapshot['enzyme']
+	lst_ec_fetch = []
+	for enzyme in lst_enzyme:
+		ec = enzyme['Code'].replace("ec:", "")
+		if dict_enzyme is None:
+			# old snapshot without enzyme list: only ECs it never saw
+			if ec not in snapshot['ec_bact'] and ec not in snapshot['ec_reac']:
+				lst_ec_fetch.append(ec)
+		elif dict_enzyme.get(enzyme['Code']) != enzyme['Name']:
+			lst_ec_fetch.append(ec)
+
+	abbr_old = set(snapshot['abbr'])
+	lst_abbr_new = [x for x in abbr_of_bacteria if x not in abbr_old]
+
+	return [lst_ec_fetch, lst_abbr_new]
+
+
+def merge_snapshot(journal, snapshot, lst_ec, lst_ec_fetch, abbr_of_bacteria, dict_new_bact_ec):
+	'''
+	Commit every EC that is not downloaded again to the journal, carried
+	over from the snapshot: bacteria that disappeared are dropped and
+	new bacteria are added from their link/ec relations.
+
+	Parameters
+	----------
+	journal : journal_functions.DownloadJournal
+		Journal of the running download
+	snapshot : dictionary
+		Output of read_snapshot
+	lst_ec : list of strings
+		Current EC numbers
+	lst_ec_fetch : list of strings
+		ECs that will be downloaded again
+	abbr_of_bacteria : list of strings
+		Current abbrieviations of bacteria
+	dict_new_bact_ec : dict
+		Output of link_functions.link_bact_ec for the new bacteria
+
+	Returns
+	-------
+	None
+	'''
+	set_fetch = set(lst_ec_fetch)
+	set_abbr = set(abbr_of_bacteria)
+	dict_ec_new_bact = lf.invert(dict_new_bact_ec)
+
+	for ec in lst_ec:
+		if ec in set_fetch or ec in journal.done:
+			continue
+		bacts = snapshot['ec_bact'].get(ec)
+		if bacts is not None:
+			bacts = [x for x in bacts if x in set_abbr]
+		if ec in dict_ec_new_bact:
+			bacts = (bacts or []) + dict_ec_new_bact[ec]
+		journal.record_sets(ec, bacts, snapshot['ec_reac'].get(ec))
+
+	return None